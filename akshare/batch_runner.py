@@ -0,0 +1,126 @@
+import pandas as pd
+from datetime import datetime, timedelta
+import condition_select
+import get_reverse_trend_stock
+import huge_price_increase
+import sideways_consilidation_break_through
+from utils.draw import display_dataframe_in_window
+from utils.fetch import FetchReport, print_report, stream_fetch
+from utils.journal import ScanJournal
+from utils.store import stock_zh_a_hist
+from utils.universe import get_spot
+
+# 已注册的选股条件：名称 -> (检查函数, 回看自然日数, 股票池筛选函数)
+# 检查函数签名为 check(stock_data, symbol)，返回值为真即命中
+SCREENERS = {}
+
+
+def register_screener(name, check, lookback_days, select_universe):
+    SCREENERS[name] = (check, lookback_days, select_universe)
+
+
+# 检查函数会往传入的 DataFrame 上写新列，每个条件都拿一份副本
+register_screener(
+    "横盘放量",
+    lambda stock_data, symbol: condition_select.check_conditions(stock_data.copy()),
+    condition_select.LOOKBACK_DAYS,
+    condition_select.select_universe,
+)
+register_screener(
+    "趋势反转",
+    lambda stock_data, symbol: get_reverse_trend_stock.check_reversal_conditions(
+        stock_data
+    ),
+    get_reverse_trend_stock.LOOKBACK_DAYS,
+    get_reverse_trend_stock.select_universe,
+)
+register_screener(
+    "箱体突破",
+    sideways_consilidation_break_through.check_box_breakout_conditions,
+    sideways_consilidation_break_through.LOOKBACK_DAYS,
+    sideways_consilidation_break_through.select_universe,
+)
+register_screener(
+    "区间翻倍",
+    lambda stock_data, symbol: huge_price_increase.check_price_changes(stock_data),
+    huge_price_increase.LOOKBACK_DAYS,
+    huge_price_increase.select_universe,
+)
+
+
+def process_stock(symbol, name, screener_names):
+    """只读取一次历史数据（取各条件中最长的回看期），再按各自的回看期切片检查"""
+    now = datetime.now()
+    lookbacks = {n: SCREENERS[n][1] for n in screener_names}
+    end_date = now.strftime("%Y%m%d")
+    start_date = (now - timedelta(days=max(lookbacks.values()))).strftime("%Y%m%d")
+    stock_data = stock_zh_a_hist(
+        symbol=symbol,
+        period="daily",
+        start_date=start_date,
+        end_date=end_date,
+        adjust="qfq",
+    )
+
+    row = {"代码": symbol, "名称": name}
+    for screener_name, lookback_days in lookbacks.items():
+        check = SCREENERS[screener_name][0]
+        since = (now - timedelta(days=lookback_days)).date()
+        window = stock_data[stock_data["日期"] >= since].reset_index(drop=True)
+        try:
+            row[screener_name] = bool(check(window, symbol))
+        except Exception as e:
+            print(f"Error checking {symbol} with {screener_name}: {e}")
+            row[screener_name] = False
+    return row
+
+
+def scan_all(names=None, report=None):
+    """
+    一次遍历股票池，把每只股票的历史数据交给所有已注册的选股条件，
+    按完成顺序逐只产出结果行（每个条件一列布尔值）
+    :param names: 要运行的条件名称列表，默认全部
+    :param report: 传入 FetchReport 可在迭代过程中读取进度
+    """
+    names = names or list(SCREENERS)
+    spot_df = get_spot()
+
+    # 每只股票只跑其所在股票池的条件
+    applicable = {}
+    symbol_names = {}
+    for screener_name in names:
+        universe = SCREENERS[screener_name][2](spot_df)
+        for symbol, name in zip(universe["代码"], universe["名称"]):
+            applicable.setdefault(symbol, []).append(screener_name)
+            symbol_names[symbol] = name
+
+    items = [
+        (symbol, symbol_names[symbol], tuple(screener_names))
+        for symbol, screener_names in applicable.items()
+    ]
+    # 逐股结果写入日志，中断后重跑只评估剩余的股票
+    journal = ScanJournal("batch_runner", names)
+    for row in journal.results():
+        yield {**dict.fromkeys(names, False), **row}
+
+    items = journal.pending(items)
+    report = report or FetchReport(len(items))
+    report.total = len(items)
+    for args, row in stream_fetch(journal.wrap(process_stock), items, report=report):
+        if row:
+            yield {**dict.fromkeys(names, False), **row}
+    print_report(report)
+
+
+def run_all(names=None):
+    """
+    :return: 至少命中一个条件的股票，每个条件一列布尔值
+    """
+    names = names or list(SCREENERS)
+    result = pd.DataFrame(list(scan_all(names)), columns=["代码", "名称"] + names)
+    return result[result[names].any(axis=1)].reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    selected_stocks = run_all()
+    display_dataframe_in_window(selected_stocks)
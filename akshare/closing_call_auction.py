@@ -7,8 +7,11 @@ import sys
 import ssl
 import os
 from datetime import datetime, timedelta
+from utils.align import align
+from utils.chips import load_chips
 from utils.draw import display_dataframe_in_window
-from concurrent.futures import ThreadPoolExecutor
+from utils.store import stock_zh_a_hist
+from utils.universe import get_spot, on_board, select
 
 # ===== 修复关键配置 =====
 nest_asyncio.apply()
@@ -31,65 +34,44 @@ ssl._create_default_https_context = ssl._create_unverified_context
 # ===== 主逻辑 =====
 def get_base_data():
     # 获取实时行情数据
-    stock_zh_a_spot_df = ak.stock_zh_a_spot_em()
+    stock_zh_a_spot_df = get_spot()
 
     # 筛选代码60，00开头的股票/排除ST的股票
-    stock_zh_a_spot_df = stock_zh_a_spot_df[
-        stock_zh_a_spot_df["代码"].str.startswith(("60", "00"))
-        & ~stock_zh_a_spot_df["名称"].str.contains("ST")
-    ]
-
-    # 单位转换：流通市值、总市值、成交额转换为亿
-    stock_zh_a_spot_df = stock_zh_a_spot_df.assign(
-        流通市值=lambda x: x["流通市值"].astype(float) / 1e8,
-        总市值=lambda x: x["总市值"].astype(float) / 1e8,
-        成交额=lambda x: x["成交额"].astype(float) / 1e8,
+    stock_zh_a_spot_df = select(
+        stock_zh_a_spot_df,
+        on_board(stock_zh_a_spot_df, ("60", "00")),
+        # 名称中含 ST 的都排除（比 is_st 的前缀匹配更宽）
+        ~stock_zh_a_spot_df["名称"].str.contains("ST"),
     )
+
     # 获取不同周期资金流向数据
     fund_flow_today = ak.stock_individual_fund_flow_rank(indicator="今日")
     fund_flow_3d = ak.stock_individual_fund_flow_rank(indicator="3日")
     fund_flow_10d = ak.stock_individual_fund_flow_rank(indicator="10日")
 
-    # 重命名字段（直接修改源数据字段名）
-    fund_flow_today.rename(columns={"今日主力净流入-净额": "今日净流入"}, inplace=True)
-    fund_flow_3d.rename(columns={"3日主力净流入-净额": "3日净流入"}, inplace=True)
-    fund_flow_10d.rename(columns={"10日主力净流入-净额": "10日净流入"}, inplace=True)
-
-    # 单位转换：今日、3日、5日、10日资金流向转换为亿
-    fund_flow_today["今日净流入"] = fund_flow_today["今日净流入"].astype(float) / 1e8
-    fund_flow_3d["3日净流入"] = fund_flow_3d["3日净流入"].astype(float) / 1e8
-    fund_flow_10d["10日净流入"] = fund_flow_10d["10日净流入"].astype(float) / 1e8
-
-    # 合并数据
-    merged_df = pd.merge(
-        stock_zh_a_spot_df[
-            [
-                "代码",
-                "名称",
-                "最新价",
-                "今开",
-                "涨跌幅",
-                "换手率",
-                "量比",
-                "成交额",
-                "流通市值",
-                "总市值",
-                "60日涨跌幅",
-                "年初至今涨跌幅",
-            ]
-        ],
-        fund_flow_today[["代码", "今日净流入"]],
-        on="代码",
-        how="left",
-    )
-
-    # 合并历史资金流向数据
-    merged_df = pd.merge(
-        merged_df, fund_flow_3d[["代码", "3日净流入"]], on="代码", how="left"
-    )
-
-    merged_df = pd.merge(
-        merged_df, fund_flow_10d[["代码", "10日净流入"]], on="代码", how="left"
+    # 按代码一次对齐各表；流通市值、总市值、成交额及各周期资金流向转换为亿
+    merged_df = align(
+        [
+            (
+                stock_zh_a_spot_df,
+                {
+                    "名称": "名称",
+                    "最新价": "最新价",
+                    "今开": "今开",
+                    "涨跌幅": "涨跌幅",
+                    "换手率": "换手率",
+                    "量比": "量比",
+                    "成交额": ("成交额", "亿"),
+                    "流通市值": ("流通市值", "亿"),
+                    "总市值": ("总市值", "亿"),
+                    "60日涨跌幅": "60日涨跌幅",
+                    "年初至今涨跌幅": "年初至今涨跌幅",
+                },
+            ),
+            (fund_flow_today, {"今日净流入": ("今日主力净流入-净额", "亿")}),
+            (fund_flow_3d, {"3日净流入": ("3日主力净流入-净额", "亿")}),
+            (fund_flow_10d, {"10日净流入": ("10日主力净流入-净额", "亿")}),
+        ]
     )
 
     return merged_df
@@ -122,7 +104,7 @@ def screen_stocks(df):
             start_date = (datetime.now() - timedelta(days=30)).strftime("%Y%m%d")
 
             # 获取历史K线数据（限定时间窗口）
-            kline_df = ak.stock_zh_a_hist(
+            kline_df = stock_zh_a_hist(
                 symbol=code,
                 period="daily",
                 start_date=start_date,
@@ -150,50 +132,31 @@ def screen_stocks(df):
     # 条件7: 剔除涨停的股票
     df = df[(df["涨跌幅"] < 8) & (df["涨跌幅"] >= 0)]
 
-    # 条件8: 筹码分布：收盘获利>70%
-    cyq_records = []
-    stock_codes = df["代码"].copy()  # 创建副本避免迭代时修改
-
-    for code in stock_codes:
-        try:
-            # 获取筹码分布数据
-            cyq_df = ak.stock_cyq_em(symbol=code, adjust="qfq")
-
-            if not cyq_df.empty:
-                latest_row = cyq_df.iloc[-1]
-                profit_ratio = latest_row["获利比例"]
-                concentration_90 = latest_row["90集中度"]
-                concentration_70 = latest_row["70集中度"]
-
-                # 获利比例>=70%,90集中度<=0.08,70集中度<=0.10
-                if (
-                    profit_ratio >= 0.9
-                    and concentration_70 <= 0.1
-                    and concentration_90 <= 0.15
-                ):
-                    cyq_records.append(
-                        {
-                            "代码": code,
-                            "获利比例": profit_ratio,
-                            "90集中度": concentration_90,
-                            "70集中度": concentration_70,
-                        }
-                    )
-                else:
-                    # 移除不达标股票
-                    df = df[df["代码"] != code]
-        except Exception as e:
-            print(f"处理{code}筹码数据失败：{str(e)}")
-            continue
-
-    # 合并筹码分布数据
-    if cyq_records:
-        cyq_df = pd.DataFrame(cyq_records)
-        df = pd.merge(df, cyq_df, on="代码", how="left")
-        # 强制类型转换确保后续计算正确
-        df[["获利比例", "90集中度", "70集中度"]] = df[
-            ["获利比例", "90集中度", "70集中度"]
-        ].astype(float)
+    # 条件8: 筹码分布：收盘获利>70%（本地筹码分布，由 sync.py 每日更新）
+    chips = load_chips()
+    if chips is None:
+        print("本地没有筹码分布数据，跳过筹码条件，请先运行 sync.py")
+    else:
+        # 获利比例按当前价计算
+        prices = df.set_index("代码")["最新价"].reindex(chips.symbols)
+        cyq_df = chips.metrics(prices.to_numpy())
+        cyq_df = cyq_df[cyq_df["代码"].isin(df["代码"])]
+        # 获利比例>=70%,90集中度<=0.08,70集中度<=0.10
+        failed = cyq_df[
+            ~(
+                (cyq_df["获利比例"] >= 0.9)
+                & (cyq_df["70集中度"] <= 0.1)
+                & (cyq_df["90集中度"] <= 0.15)
+            )
+        ]
+        # 移除不达标股票，没有筹码数据的股票与原先请求失败时一样保留
+        df = df[~df["代码"].isin(failed["代码"])]
+        df = pd.merge(
+            df,
+            cyq_df[["代码", "获利比例", "90集中度", "70集中度"]],
+            on="代码",
+            how="left",
+        )
 
     # 条件9：计算3天、5天、10天涨幅
 
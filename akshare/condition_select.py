@@ -1,9 +1,16 @@
-import akshare as ak
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor
 from utils.draw import display_dataframe_in_window
+from utils.fetch import FetchReport, print_report, stream_fetch
+from utils.journal import ScanJournal, check_params
+from utils.panel import load_panel
+from utils.store import stock_zh_a_hist
+from utils.universe import get_spot, has_price, is_st, on_board, select
+from utils.vectorized import check_conditions_panel, panel_frames
+
+# 历史数据回看自然日数
+LOOKBACK_DAYS = 2000
 
 
 def check_conditions(
@@ -17,6 +24,8 @@ def check_conditions(
     bollinger_threshold=0.15,  # 布林带收缩阈值
     amplitude_threshold=0.3,  # 振幅阈值
     atr_multiplier=0.3,  # ATR突破倍数
+    price_quantile=0.2,  # 价格分位阈值
+    percentile_window=None,  # 价格分位的计算窗口（K线数），None 为全部历史
 ):
     if len(stock_data) < 250:
         return None
@@ -66,65 +75,81 @@ def check_conditions(
     )
 
     # 6.当前价格处于历史20%分位以下
-    price_percentile = stock_data["收盘"].quantile(0.2)  # 计算20%分位值
+    recent_close = (
+        stock_data["收盘"].iloc[-percentile_window:]
+        if percentile_window
+        else stock_data["收盘"]
+    )
+    price_percentile = recent_close.quantile(price_quantile)  # 计算20%分位值
     is_low_percentile = stock_data["收盘"].iloc[-1] < price_percentile
 
     return is_consolidation & is_low_amplitude & is_volume_growing & is_low_percentile
 
 
-
+# 抓取或计算出错时直接抛出异常，由 fetch_all 重试并记录失败
 def process_stock(symbol, name):
-    try:
-        end_date = datetime.now().strftime("%Y%m%d")
-        start_date = (datetime.now() - timedelta(days=2000)).strftime("%Y%m%d")
-        stock_data = ak.stock_zh_a_hist(
-            symbol=symbol,
-            period="daily",
-            start_date=start_date,
-            end_date=end_date,
-            adjust="qfq",
-        )
-        if check_conditions(stock_data):
-            return {
-                "代码": symbol,
-                "名称": name,
-            }
-    except Exception as e:
-        print(f"Error processing {symbol}: {e}")
-        return None
+    end_date = datetime.now().strftime("%Y%m%d")
+    start_date = (datetime.now() - timedelta(days=LOOKBACK_DAYS)).strftime("%Y%m%d")
+    stock_data = stock_zh_a_hist(
+        symbol=symbol,
+        period="daily",
+        start_date=start_date,
+        end_date=end_date,
+        adjust="qfq",
+    )
+    if check_conditions(stock_data):
+        return {
+            "代码": symbol,
+            "名称": name,
+        }
     return None
 
 
-def filter_stocks():
-    df = ak.stock_zh_a_spot_em()
-    # 排除值为nan的数据
-    df = df[~df["最新价"].isna()]
-    df["流通市值"] = pd.to_numeric(df["流通市值"], errors="coerce")
-    # 排除创业板、科创板、ST股票、总市值大于500亿的股
-    df = df[
-        ~(
-            df["代码"].str.startswith(("30", "688"))
-            | df["名称"].str.startswith(("ST", "*ST"))
-        )
-    ]
+def select_universe(df):
+    # 排除值为nan的数据，排除创业板、科创板、ST股票
+    return select(df, has_price(df), ~on_board(df, ("30", "688")), ~is_st(df))
+
 
+def scan_stocks(report=None):
+    """
+    逐只产出命中的股票：先产出日志中已评估过的命中，再按完成顺序产出新的命中
+    :param report: 传入 FetchReport 可在迭代过程中读取进度（done/total/failed）
+    """
+    df = select_universe(get_spot())
     symbols = df["代码"].tolist()
     names = df["名称"].tolist()
 
-    results = []
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = [
-            executor.submit(process_stock, symbol, name)
-            for symbol, name in zip(symbols, names)
-        ]
-        for future in futures:
-            result = future.result()
-            if result:
-                results.append(result)
+    # 逐股结果写入日志，中断后重跑只评估剩余的股票；
+    # 失败的股票会自动重试，最终仍失败的会在汇总中列出，且不写入日志
+    journal = ScanJournal(
+        "condition_select", check_params(check_conditions, lookback_days=LOOKBACK_DAYS)
+    )
+    yield from journal.results()
+
+    items = journal.pending(list(zip(symbols, names)))
+    report = report or FetchReport(len(items))
+    report.total = len(items)
+    stream = stream_fetch(journal.wrap(process_stock), items, report=report)
+    for args, result in stream:
+        if result:
+            yield result
+    print_report(report)
+
 
+def filter_stocks():
+    results = list(scan_stocks())
     return pd.DataFrame(results)
 
 
+def filter_stocks_vectorized(panel=None):
+    """基于本地内存映射面板一次计算全市场（需先运行 sync.py），判断逻辑与 filter_stocks 相同"""
+    panel = panel or load_panel()
+    df = select_universe(get_spot())
+    hits = check_conditions_panel(panel_frames(panel, LOOKBACK_DAYS))
+    df = df[df["代码"].isin(hits.index[hits])]
+    return df[["代码", "名称"]].reset_index(drop=True)
+
+
 if __name__ == "__main__":
     selected_stocks = filter_stocks()
     display_dataframe_in_window(selected_stocks)
@@ -1,8 +1,7 @@
 import akshare as ak
 import pandas as pd
-from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor
 from utils.draw import display_dataframe_in_window
+from utils.store import HIST_COLUMNS, read_cross_section
 
 
 def get_sz_stock_list():
@@ -27,79 +26,39 @@ def get_merged_stock_list():
     return stock_list
 
 
-def get_stock_daily_data(symbol, date_str, name):
-    try:
-        stock_data = ak.stock_zh_a_hist(
-            symbol=symbol,
-            period="daily",
-            start_date=date_str,
-            end_date=date_str,
-            adjust="qfq",
-        )
-        # 插入股票名称数据列，在股票代码symbol之后
-        if stock_data is not None and not stock_data.empty:
-            stock_data.insert(1, "名称", name)
-            return stock_data
-        else:
-            return pd.DataFrame(
-                columns=[
-                    "代码",
-                    "名称",
-                    "成交额",
-                    "涨跌幅",
-                    "日期",
-                    "最高",
-                    "最低",
-                    "成交量",
-                    "涨跌额",
-                    "振幅",
-                ]
-            )
-    except Exception as e:
-        print(f"Error processing {symbol}: {e}")
-        return pd.DataFrame(
-            columns=[
-                "代码",
-                "名称",
-                "成交额",
-                "涨跌幅",
-                "日期",
-                "最高",
-                "最低",
-                "成交量",
-                "涨跌额",
-                "振幅",
-            ]
-        )
+def get_daily_cross_section(date_str, stock_list):
+    """
+    从本地全市场年表一次读取某日的横截面数据，替代逐只股票请求
+    :return: 与原逐只请求后拼接、删列得到的结果相同的列
+    """
+    daily_data = read_cross_section(date_str)
+    combined_data = daily_data.merge(
+        stock_list.rename(columns={"symbol": "股票代码", "name": "名称"}),
+        on="股票代码",
+        how="inner",
+    )
+    # 插入股票名称数据列，在日期之后
+    combined_data = combined_data[
+        ["日期", "名称"] + [col for col in HIST_COLUMNS if col != "日期"]
+    ]
+    # 删除日期列、涨跌额数据
+    return combined_data.drop(
+        columns=["日期", "最高", "最低", "成交量", "涨跌额", "振幅"]
+    )
 
 
 def get_history_daily_data(date_str="20250407"):
     stock_list = get_merged_stock_list()
-    symbols = stock_list["symbol"].tolist()
-    names = stock_list["name"].tolist()
+    combined_data = get_daily_cross_section(date_str, stock_list)
+    if combined_data.empty:
+        print(f"本地无{date_str}的日线数据，请先运行 sync.py 同步")
+        return
 
-    all_data = []
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = [
-            executor.submit(get_stock_daily_data, symbol, date_str, name)
-            for symbol, name in zip(symbols, names)
-        ]
-        for future in futures:
-            result = future.result()
-            if not result.empty:
-                all_data.append(result)
-
-    if all_data:
-        combined_data = pd.concat(all_data, ignore_index=True)
-        # 删除日期列、涨跌额数据
-        combined_data = combined_data.drop(
-            columns=["日期", "最高", "最低", "成交量", "涨跌额", "振幅"]
-        )
-        # 单位转换
-        combined_data["成交额"] = (combined_data["成交额"] / 1e8).round(2)
-        # 涨幅大于0
-        combined_data = combined_data[combined_data["涨跌幅"] >= 0]
-        display_dataframe_in_window(combined_data)
+    # 单位转换
+    combined_data["成交额"] = (combined_data["成交额"] / 1e8).round(2)
+    # 涨幅大于0
+    combined_data = combined_data[combined_data["涨跌幅"] >= 0]
+    display_dataframe_in_window(combined_data)
 
 
 if __name__ == "__main__":
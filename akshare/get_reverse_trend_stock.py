@@ -1,9 +1,17 @@
-import akshare as ak
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor
 from utils.draw import display_dataframe_in_window
+from utils.fetch import FetchReport, print_report, stream_fetch
+from utils.journal import ScanJournal, check_params
+from utils.panel import load_panel
+from utils.store import stock_zh_a_hist
+from utils.universe import get_spot, on_board, select
+from utils.vectorized import check_reversal_conditions_panel, panel_frames
+
+# 历史数据回看自然日数
+LOOKBACK_DAYS = 365 * 3
+
 
 def check_reversal_conditions(
     stock_data,
@@ -99,47 +107,71 @@ def check_reversal_conditions(
     )
 
 
+# 抓取或计算出错时直接抛出异常，由 fetch_all 重试并记录失败
 def process_stock(symbol, name):
-    try:
-        end_date = datetime.now().strftime("%Y%m%d")
-        start_date = (datetime.now() - timedelta(days=365 * 3)).strftime("%Y%m%d")
-        stock_data = ak.stock_zh_a_hist(
-            symbol=symbol,
-            period="daily",
-            start_date=start_date,
-            end_date=end_date,
-            adjust="qfq",
-        )
-        if check_reversal_conditions(stock_data):
-            return {
-                "代码": symbol,
-                "名称": name,
-            }
-    except Exception as e:
-        print(f"Error processing {symbol}: {e}")
-        return None
+    end_date = datetime.now().strftime("%Y%m%d")
+    start_date = (datetime.now() - timedelta(days=LOOKBACK_DAYS)).strftime("%Y%m%d")
+    stock_data = stock_zh_a_hist(
+        symbol=symbol,
+        period="daily",
+        start_date=start_date,
+        end_date=end_date,
+        adjust="qfq",
+    )
+    if check_reversal_conditions(stock_data):
+        return {
+            "代码": symbol,
+            "名称": name,
+        }
     return None
 
 
-def filter_stocks():
-    df = ak.stock_zh_a_spot_em()
+def select_universe(df):
     # 排除nan的数据
     df = df.dropna()
-    # 筛选代码60、30开头的股票
-    df = df[df["代码"].str.startswith(("60", "00"))]
+    # 筛选代码60、00开头的股票
+    return select(df, on_board(df, ("60", "00")))
+
+
+def scan_stocks(report=None):
+    """
+    逐只产出命中的股票：先产出日志中已评估过的命中，再按完成顺序产出新的命中
+    :param report: 传入 FetchReport 可在迭代过程中读取进度（done/total/failed）
+    """
+    df = select_universe(get_spot())
     symbols = df["代码"].tolist()
     names = df["名称"].tolist()
 
-    results = []
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = [
-            executor.submit(process_stock, symbol, name)
-            for symbol, name in zip(symbols, names)
-        ]
-        for future in futures:
-            result = future.result()
-            if result:
-                results.append(result)
+    # 逐股结果写入日志，中断后重跑只评估剩余的股票；
+    # 失败的股票会自动重试，最终仍失败的会在汇总中列出，且不写入日志
+    journal = ScanJournal(
+        "get_reverse_trend_stock",
+        check_params(check_reversal_conditions, lookback_days=LOOKBACK_DAYS),
+    )
+    yield from journal.results()
+
+    items = journal.pending(list(zip(symbols, names)))
+    report = report or FetchReport(len(items))
+    report.total = len(items)
+    stream = stream_fetch(journal.wrap(process_stock), items, report=report)
+    for args, result in stream:
+        if result:
+            yield result
+    print_report(report)
+
+
+def filter_stocks_vectorized(panel=None):
+    """基于本地内存映射面板一次计算全市场（需先运行 sync.py），判断逻辑与 filter_stocks 相同"""
+    panel = panel or load_panel()
+    df = select_universe(get_spot())
+    frames = panel_frames(panel, LOOKBACK_DAYS, fields=("close", "volume"))
+    hits = check_reversal_conditions_panel(frames)
+    df = df[df["代码"].isin(hits.index[hits])]
+    return df[["代码", "名称"]].reset_index(drop=True)
+
+
+def filter_stocks():
+    results = list(scan_stocks())
     display_dataframe_in_window(results)
     return pd.DataFrame(results)
 
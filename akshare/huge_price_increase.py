@@ -1,55 +1,112 @@
-import akshare as ak
-import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor
+from utils.fetch import FetchReport, print_report, stream_fetch
+from utils.journal import ScanJournal, check_params
+from utils.store import stock_zh_a_hist
+from utils.universe import get_spot, has_price, select
+
+# 历史数据回看自然日数
+LOOKBACK_DAYS = 2 * 365
 
 
 def get_recent_five_years_data():
     end_date = datetime.now().strftime("%Y%m%d")
-    start_date = (datetime.now() - timedelta(days=2 * 365)).strftime("%Y%m%d")
+    start_date = (datetime.now() - timedelta(days=LOOKBACK_DAYS)).strftime("%Y%m%d")
     return start_date, end_date
 
 
-def calculate_price_changes(stock_data):
-    price_changes = []
-    n = len(stock_data)
-    for i in range(n):
-        for j in range(i + 1, n):
-            start_price = stock_data["收盘"].iloc[i]
-            end_price = stock_data["收盘"].iloc[j]
-            change = (end_price - start_price) / start_price
-            if change > 1.0:  # 涨幅超过100%
-                start_date = stock_data["日期"].iloc[i]
-                end_date = stock_data["日期"].iloc[j]
-                price_changes.append((start_date, end_date, change))
-    return price_changes
+def max_price_change(closes):
+    """
+    任意两日（先买后卖）之间的最大涨幅，用前缀最低价一次扫描得到，O(n)。
+    只考虑起点价格为正的区间（前复权价格可能为负或为零）。
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    if len(closes) < 2:
+        return np.nan
+    lows = np.minimum.accumulate(np.where(closes > 0, closes, np.inf))[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        changes = (closes[1:] - lows) / lows
+    changes = changes[np.isfinite(changes)]
+    return changes.max() if len(changes) else np.nan
 
 
-def process_stock(symbol, name):
-    try:
-        start_date, end_date = get_recent_five_years_data()
-        stock_data = ak.stock_zh_a_hist(
-            symbol=symbol,
-            period="daily",
-            start_date=start_date,
-            end_date=end_date,
-            adjust="qfq",
+def _merge_overlapping(price_changes):
+    """把互相重叠的区间合并为一段，每段只保留涨幅最大的一个区间"""
+    merged = []
+    run_end = None
+    for i, j, change in price_changes:
+        if run_end is not None and i <= run_end:
+            run_end = max(run_end, j)
+            if change > merged[-1][2]:
+                merged[-1] = (i, j, change)
+        else:
+            run_end = j
+            merged.append((i, j, change))
+    return merged
+
+
+def calculate_price_changes(stock_data, threshold=1.0, maximal=False, block_size=256):
+    """
+    找出所有涨幅超过 threshold 的 (起始日期, 结束日期, 涨幅) 区间，按起始、结束日期排序。
+    按起点分块用矩阵一次算出所有终点的涨幅，并跳过之后最高价也达不到阈值的起点。
+    :param maximal: 为 True 时把重叠的区间合并，每段只保留涨幅最大的区间
+    """
+    closes = stock_data["收盘"].to_numpy(dtype=np.float64)
+    dates = stock_data["日期"].to_numpy()
+    n = len(closes)
+    if n < 2:
+        return []
+
+    # 起点之后的最高收盘价；起点价格为正时，涨幅随终点价格单调，达不到阈值的起点可直接跳过
+    future_highs = np.fmax.accumulate(closes[::-1])[::-1][1:]
+    starts = closes[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        reachable = (future_highs - starts) / starts > threshold
+    candidates = np.flatnonzero(reachable | (starts <= 0))
+
+    pairs = []
+    for offset in range(0, len(candidates), block_size):
+        rows = candidates[offset : offset + block_size]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            changes = (closes[None, :] - closes[rows, None]) / closes[rows, None]
+        hit = (changes > threshold) & (np.arange(n)[None, :] > rows[:, None])
+        row_idx, end_idx = np.nonzero(hit)
+        pairs.extend(
+            zip(rows[row_idx].tolist(), end_idx.tolist(), changes[row_idx, end_idx])
         )
-        if len(stock_data) < 240 * 2:  # 确保有足够的历史数据
-            return None
-
-        price_changes = calculate_price_changes(stock_data)
-        if price_changes:
-            return {"代码": symbol, "名称": name, "区间涨幅": price_changes}
-    except Exception as e:
-        print(f"Error processing {symbol}: {e}")
+
+    if maximal:
+        pairs = _merge_overlapping(pairs)
+    return [(dates[i], dates[j], change) for i, j, change in pairs]
+
+
+def check_price_changes(stock_data):
+    if len(stock_data) < 240 * 2:  # 确保有足够的历史数据
+        return None
+    # 先用 O(n) 的最大涨幅排除绝大多数股票，只有可能命中的才枚举区间
+    closes = stock_data["收盘"].to_numpy(dtype=np.float64)
+    if (closes > 0).all() and not max_price_change(closes) > 1.0:
+        return []
+    return calculate_price_changes(stock_data)
+
+
+# 抓取或计算出错时直接抛出异常，由 fetch_all 重试并记录失败
+def process_stock(symbol, name):
+    start_date, end_date = get_recent_five_years_data()
+    stock_data = stock_zh_a_hist(
+        symbol=symbol,
+        period="daily",
+        start_date=start_date,
+        end_date=end_date,
+        adjust="qfq",
+    )
+    price_changes = check_price_changes(stock_data)
+    if price_changes:
+        return {"代码": symbol, "名称": name, "区间涨幅": price_changes}
     return None
 
 
-def filter_stocks():
-    df = ak.stock_zh_a_spot_em()
-    # 排除值为nan的数据
-    df = df[~df["最新价"].isna()]
+def select_universe(df):
     # 排除创业板、科创板、ST股票
     # df = df[
     #     ~(
@@ -58,27 +115,45 @@ def filter_stocks():
     #         | (df["流通市值"] > 5e8)
     #     )
     # ]
+    # 排除值为nan的数据
+    return select(df, has_price(df))
 
+
+def scan_stocks(report=None):
+    """
+    逐只产出命中的股票：先产出日志中已评估过的命中，再按完成顺序产出新的命中
+    :param report: 传入 FetchReport 可在迭代过程中读取进度（done/total/failed）
+    """
+    df = select_universe(get_spot())
     symbols = df["代码"].tolist()
     names = df["名称"].tolist()
 
-    results = []
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = [
-            executor.submit(process_stock, symbol, name)
-            for symbol, name in zip(symbols, names)
-        ]
-        for future in futures:
-            result = future.result()
-            if result:
-                results.append(result)
+    # 逐股结果写入日志，中断后重跑只评估剩余的股票；
+    # 失败的股票会自动重试，最终仍失败的会在汇总中列出，且不写入日志
+    journal = ScanJournal(
+        "huge_price_increase",
+        check_params(calculate_price_changes, lookback_days=LOOKBACK_DAYS),
+    )
+    yield from journal.results()
+
+    items = journal.pending(list(zip(symbols, names)))
+    report = report or FetchReport(len(items))
+    report.total = len(items)
+    stream = stream_fetch(journal.wrap(process_stock), items, report=report)
+    for args, result in stream:
+        if result:
+            yield result
+    print_report(report)
 
+
+def filter_stocks():
+    results = list(scan_stocks())
     return results
 
 
 if __name__ == "__main__":
-    selected_stocks = filter_stocks()
-    for stock in selected_stocks:
+    # 边扫描边输出，不必等全市场扫描结束
+    for stock in scan_stocks():
         print(f"代码: {stock['代码']}, 名称: {stock['名称']}")
         for start_date, end_date, change in stock["区间涨幅"]:
             print(f"  区间起止: {start_date} - {end_date}, 涨幅: {change*100:.2f}%")
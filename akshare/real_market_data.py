@@ -1,9 +1,9 @@
-import akshare as ak
 from utils.draw import display_dataframe_in_window
+from utils.universe import get_spot
 
 
 def get_sse_summary():
-    df = ak.stock_zh_a_spot_em()
+    df = get_spot()
     return df
 
 
@@ -1,18 +1,40 @@
-import akshare as ak
 import pandas as pd
 import numpy as np
-from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from utils.draw import display_dataframe_in_window
-
-
-def check_box_breakout_conditions(stock_data, symbol):
-    if len(stock_data) < 250:
+from utils.fetch import FetchReport, print_report, stream_fetch
+from utils.journal import ScanJournal, check_params
+from utils.panel import load_panel
+from utils.store import stock_zh_a_hist
+from utils.universe import (
+    float_cap_between,
+    get_spot,
+    has_price,
+    is_st,
+    on_board,
+    select,
+)
+from utils.vectorized import check_box_breakout_panel, panel_frames
+
+# 箱体长度（最新一根之前的K线数）
+BOX_LOOKBACK = 250
+# 历史数据回看自然日数：按每年约 243 个交易日折算出 BOX_LOOKBACK + 1 根K线，再留出节假日余量
+LOOKBACK_DAYS = int((BOX_LOOKBACK + 1) * 365 / 243) + 30
+
+
+def check_box_breakout_conditions(stock_data, symbol, box_lookback=BOX_LOOKBACK):
+    """
+    :param box_lookback: 箱体长度（最新一根之前的K线数）；多个长度一起扫描见
+                         utils.vectorized.check_box_breakout_panel
+    """
+    if len(stock_data) <= box_lookback:
         return False
 
-    # 计算箱体震荡区间（过去250日最高价和最低价）
-    box_high = stock_data["最高"].iloc[-250:].max()
-    box_low = stock_data["最低"].iloc[-250:].min()
+    # 计算箱体震荡区间（最新一根之前250日的最高价和最低价）；
+    # 箱体含最新一根时收盘价不可能高于箱体上沿
+    box = stock_data.iloc[-box_lookback - 1 : -1]
+    box_high = box["最高"].max()
+    box_low = box["最低"].min()
 
     # 1. 检查股价是否横盘箱体震荡（价格波动幅度小于一定阈值）
     price_range = (box_high - box_low) / box_low
@@ -37,62 +59,82 @@ def check_box_breakout_conditions(stock_data, symbol):
     return True
 
 
+# 抓取或计算出错时直接抛出异常，由 fetch_all 重试并记录失败
 def process_stock(symbol, name):
-    try:
-        end_date = datetime.now().strftime("%Y%m%d")
-        start_date = (datetime.now() - timedelta(days=365)).strftime("%Y%m%d")
-        stock_data = ak.stock_zh_a_hist(
-            symbol=symbol,
-            period="daily",
-            start_date=start_date,
-            end_date=end_date,
-            adjust="qfq",
-        )
-        if check_box_breakout_conditions(stock_data, symbol):
-            return {
-                "代码": symbol,
-                "名称": name,
-            }
-    except Exception as e:
-        print(f"Error processing {symbol}: {e}")
-        return None
+    end_date = datetime.now().strftime("%Y%m%d")
+    start_date = (datetime.now() - timedelta(days=LOOKBACK_DAYS)).strftime("%Y%m%d")
+    stock_data = stock_zh_a_hist(
+        symbol=symbol,
+        period="daily",
+        start_date=start_date,
+        end_date=end_date,
+        adjust="qfq",
+    )
+    if check_box_breakout_conditions(stock_data, symbol):
+        return {
+            "代码": symbol,
+            "名称": name,
+        }
     return None
 
 
-def filter_stocks():
-    df = ak.stock_zh_a_spot_em()
-    # 排除值为nan的数据
-    df = df[~df["最新价"].isna()]
-    df["流通市值"] = pd.to_numeric(df["流通市值"], errors="coerce")
-
+def select_universe(df):
     # 过滤条件：
+    # 0. 排除值为nan的数据
     # 1. 沪深主板，代码以60或00开头
     # 2. 不是ST股
     # 3. 流通市值在20-200亿之间
-    df = df[
-        df["代码"].str.startswith(("60", "00"))
-        & ~df["名称"].str.startswith(("ST", "*ST"))
-        & (df["流通市值"] >= 20e8)
-        & (df["流通市值"] <= 200e8)
-    ]
+    return select(
+        df,
+        has_price(df),
+        on_board(df, ("60", "00")),
+        ~is_st(df),
+        float_cap_between(df, 20e8, 200e8),
+    )
+
 
+def scan_stocks(report=None):
+    """
+    逐只产出命中的股票：先产出日志中已评估过的命中，再按完成顺序产出新的命中
+    :param report: 传入 FetchReport 可在迭代过程中读取进度（done/total/failed）
+    """
+    df = select_universe(get_spot())
     symbols = df["代码"].tolist()
     names = df["名称"].tolist()
 
-    results = []
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = [
-            executor.submit(process_stock, symbol, name)
-            for symbol, name in zip(symbols, names)
-        ]
-        for future in futures:
-            result = future.result()
-            if result:
-                results.append(result)
+    # 逐股结果写入日志，中断后重跑只评估剩余的股票；
+    # 失败的股票会自动重试，最终仍失败的会在汇总中列出，且不写入日志
+    journal = ScanJournal(
+        "sideways_consilidation_break_through",
+        check_params(check_box_breakout_conditions, lookback_days=LOOKBACK_DAYS),
+    )
+    yield from journal.results()
+
+    items = journal.pending(list(zip(symbols, names)))
+    report = report or FetchReport(len(items))
+    report.total = len(items)
+    stream = stream_fetch(journal.wrap(process_stock), items, report=report)
+    for args, result in stream:
+        if result:
+            yield result
+    print_report(report)
+
 
+def filter_stocks():
+    results = list(scan_stocks())
     return pd.DataFrame(results)
 
 
+def filter_stocks_vectorized(panel=None):
+    """基于本地内存映射面板一次计算全市场（需先运行 sync.py），判断逻辑与 filter_stocks 相同"""
+    panel = panel or load_panel()
+    df = select_universe(get_spot())
+    frames = panel_frames(panel, LOOKBACK_DAYS)
+    hits = check_box_breakout_panel(frames, lookbacks=(BOX_LOOKBACK,)).loc[BOX_LOOKBACK]
+    df = df[df["代码"].isin(hits.index[hits])]
+    return df[["代码", "名称"]].reset_index(drop=True)
+
+
 if __name__ == "__main__":
     selected_stocks = filter_stocks()
     display_dataframe_in_window(selected_stocks)
@@ -0,0 +1,67 @@
+import pandas as pd
+from datetime import datetime
+from utils.chips import refresh_chips
+from utils.fetch import fetch_all
+from utils.fund_flow import sync_fund_flow
+from utils.indicators import refresh_indicators
+from utils.panel import build_panel
+from utils.store import build_market, list_symbols, load_meta, sync_symbol
+from utils.universe import get_spot
+
+
+# 每日收盘后执行：每只股票只下载本地最后一根K线之后的数据
+def sync_one(symbol, end_date, adjust):
+    previous = (load_meta(symbol, adjust) or {}).get("last_date")
+    status, meta = sync_symbol(symbol, end_date, adjust)
+    return {
+        "代码": symbol,
+        "状态": status,
+        "上次日期": previous,
+        "最后日期": meta.get("last_date"),
+    }
+
+
+def sync_all(symbols=None, end_date=None, adjust="qfq"):
+    """
+    增量同步全市场日线
+    :param symbols: 股票代码列表，默认取本地已存储的股票与当前A股列表的并集
+    :return: 每只股票的同步状态表
+    """
+    end_date = end_date or datetime.now().strftime("%Y%m%d")
+    if symbols is None:
+        spot_df = get_spot()
+        symbols = sorted(set(list_symbols(adjust)) | set(spot_df["代码"]))
+
+    items = [(symbol, end_date, adjust) for symbol in symbols]
+    results, fetch_report = fetch_all(sync_one, items)
+    report = pd.DataFrame(
+        [
+            result
+            or {"代码": args[0], "状态": "failed", "上次日期": None, "最后日期": None}
+            for args, result in zip(items, results)
+        ]
+    )
+    print(report["状态"].value_counts().to_string())
+
+    # 有股票因复权改写而重建时，所有年份的全市场年表都要重建
+    rebuilt = report.loc[report["状态"].isin(["created", "rebuilt"]), "代码"]
+    if len(rebuilt):
+        build_market(adjust=adjust)
+    else:
+        # 追加的K线从各股票上次的最后日期之后开始，跨年同步时旧年份的年表也要重建
+        appended = report.loc[report["状态"] == "appended", "上次日期"].dropna()
+        first_year = int(appended.min()[:4]) if len(appended) else int(end_date[:4])
+        build_market(years=range(first_year, int(end_date[:4]) + 1), adjust=adjust)
+    panel = build_panel(adjust)
+    if panel is not None:
+        refresh_chips(panel, rebuilt=rebuilt, adjust=adjust)
+    # 指标状态只追加新K线；新建或重建的股票历史已变，从头计算
+    synced = report.loc[report["状态"] != "failed", "代码"]
+    refresh_indicators(synced, rebuilt=rebuilt, adjust=adjust)
+    # 资金流每天只需请求一次全市场排名表
+    sync_fund_flow()
+    return report
+
+
+if __name__ == "__main__":
+    sync_all()
@@ -0,0 +1,64 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# 脚本以 akshare 目录为工作目录运行（import utils.xxx），测试同样把该目录加入搜索路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.panel import MarketPanel  # noqa: E402
+
+PANEL_END_DATE = "20250408"
+
+
+@pytest.fixture(scope="session")
+def synthetic_panel():
+    """
+    合成的全市场面板（字段 × 股票 × 交易日）：缓慢下跌的低波动走势，
+    部分股票末尾放量反弹，部分股票中途停牌或上市不久（K线少于 120 / 250 根）
+    """
+    rng = np.random.default_rng(7)
+    dates = pd.bdate_range(end=PANEL_END_DATE, periods=900)
+    n_symbols, days = 80, len(dates)
+    fields = ["open", "high", "low", "close", "volume", "amount", "turnover"]
+    values = np.full((len(fields), n_symbols, days), np.nan)
+    for i in range(n_symbols):
+        returns = rng.normal(-0.0008, 0.008, days)
+        volume = rng.uniform(0.8, 1.2, days) * 1e5
+        bounce = int(rng.integers(1, 8))
+        if i % 2:
+            # 末尾放量反弹
+            returns[-bounce:] += rng.uniform(0.005, 0.03)
+            volume[-bounce - 5 :] *= np.linspace(1, rng.uniform(1.5, 4), bounce + 5)
+        close = 10 * np.exp(np.cumsum(returns))
+        open_ = close * np.exp(rng.normal(0, 0.003, days))
+        high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, 0.004, days)))
+        low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, 0.004, days)))
+        row = np.stack(
+            [open_, high, low, close, volume, close * volume, volume / 1e6 * 100]
+        )
+        if i % 5 == 0:
+            # 上市不久：部分少于 120 根、部分少于 250 根K线
+            row[:, : days - int(rng.integers(60, 300))] = np.nan
+        if i % 3 == 0:
+            # 中途停牌
+            gap = int(rng.integers(days - 600, days - 40))
+            row[:, gap : gap + int(rng.integers(5, 30))] = np.nan
+        values[:, i] = row
+    symbols = [f"{600000 + i:06d}" for i in range(n_symbols)]
+    return MarketPanel(
+        values.astype(np.float32), symbols, list(dates.strftime("%Y%m%d")), fields
+    )
+
+
+@pytest.fixture(scope="session")
+def history(synthetic_panel):
+    """逐只取数据：history(symbol, lookback_days) 与 panel_frames 取同一区间的日线"""
+
+    def frame(symbol, lookback_days):
+        start = pd.Timestamp(PANEL_END_DATE) - pd.Timedelta(days=lookback_days)
+        return synthetic_panel.frame(symbol, start.strftime("%Y%m%d"), PANEL_END_DATE)
+
+    return frame
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+from sideways_consilidation_break_through import check_box_breakout_conditions
+from utils.backtest import BarFrames, box_breakout_signals
+from utils.panel import MarketPanel
+
+
+def _panel(days=400):
+    """横盘的合成面板：第一只股票在第 300 个交易日放量突破，第二只一直横盘且中途停牌"""
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2020-01-01", periods=days).strftime("%Y%m%d")
+    fields = ["high", "low", "close", "volume"]
+    close = 10 + rng.uniform(-0.5, 0.5, (2, days))
+    # 字段 × 股票 × 交易日
+    values = np.stack([close + 0.2, close - 0.2, close, np.full((2, days), 1000.0)])
+    values[3, 0, 295:300] = 3000.0
+    values[0, 0, 299], values[2, 0, 299] = 12.1, 12.0
+    values[:, 1, 100:120] = np.nan
+    return MarketPanel(
+        values.astype(np.float32), ["600000", "600001"], list(dates), fields
+    )
+
+
+def test_box_breakout_signals_fire_on_breakout_bar():
+    panel = _panel()
+    bars = BarFrames(panel)
+    signals = box_breakout_signals(bars)
+
+    assert signals.to_numpy().any()
+    assert signals["600000"].iloc[299]
+    assert not signals["600001"].any()
+    # 每根K线上的信号与只取到该K线为止的历史调用检查函数一致
+    for symbol in panel.symbols:
+        df = panel.frame(symbol)
+        for t in range(240, len(df)):
+            expected = check_box_breakout_conditions(df.iloc[: t + 1], symbol)
+            assert bool(signals[symbol].iloc[t]) == expected
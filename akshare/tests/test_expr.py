@@ -0,0 +1,25 @@
+import pytest
+from utils.expr import Expression, screen
+
+
+def test_screen_evaluates_on_panel(synthetic_panel):
+    text = "fast = ma(close, 5)\nfast > ma(close, 20) and not volume < 0"
+    hits = screen(text, synthetic_panel, end_date=synthetic_panel.dates[-1])
+    assert list(hits.columns) == ["fast", text.splitlines()[-1]]
+    assert len(hits) and hits.iloc[:, -1].all()
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "ma(2, 5) > close",
+        "x = 1\nx > 0",
+        "1 < 2",
+        "close > 0 and 1",
+        "not 0",
+        "abs(-1) < close",
+    ],
+)
+def test_constant_expressions_rejected_at_compile_time(text):
+    with pytest.raises(ValueError):
+        Expression(text)
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+from utils.extrema import rolling_max, rolling_min
+
+
+def _values(rows=300, columns=5, seed=0):
+    rng = np.random.default_rng(seed)
+    values = 20 + np.cumsum(rng.normal(0, 0.3, (rows, columns)), axis=0)
+    values[:40, 1] = np.nan  # 上市较晚
+    values[150:160, 2] = np.nan  # 停牌
+    values[100:200, 3] = np.nan  # 停牌超过窗口长度
+    return values
+
+
+def test_rolling_extrema_match_pandas():
+    values = _values()
+    frame = pd.DataFrame(values)
+    for window in (1, 7, 20, 60, 250, 300, 400):
+        rolling = frame.rolling(window, min_periods=1)
+        expected_max = rolling.max().to_numpy()
+        expected_min = rolling.min().to_numpy()
+        # 不足 window 行时为 nan
+        expected_max[: window - 1] = np.nan
+        expected_min[: window - 1] = np.nan
+        np.testing.assert_array_equal(rolling_max(values, window), expected_max)
+        np.testing.assert_array_equal(rolling_min(values, window), expected_min)
+        np.testing.assert_array_equal(
+            rolling_max(values[:, 0], window), expected_max[:, 0]
+        )
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+from huge_price_increase import (
+    _merge_overlapping,
+    calculate_price_changes,
+    max_price_change,
+)
+
+
+def _loop_price_changes(stock_data):
+    """改写前的逐对循环实现，作为对照"""
+    price_changes = []
+    n = len(stock_data)
+    for i in range(n):
+        for j in range(i + 1, n):
+            start_price = stock_data["收盘"].iloc[i]
+            end_price = stock_data["收盘"].iloc[j]
+            change = (end_price - start_price) / start_price
+            if change > 1.0:
+                start_date = stock_data["日期"].iloc[i]
+                end_date = stock_data["日期"].iloc[j]
+                price_changes.append((start_date, end_date, change))
+    return price_changes
+
+
+def _stock_data(seed, n=150):
+    rng = np.random.default_rng(seed)
+    close = 5 * np.exp(np.cumsum(rng.normal(0.004, 0.05, n)))
+    dates = pd.bdate_range("2023-01-02", periods=n).date
+    return pd.DataFrame({"日期": dates, "收盘": close})
+
+
+def test_calculate_price_changes_matches_loop():
+    found = 0
+    for seed in range(6):
+        stock_data = _stock_data(seed)
+        expected = _loop_price_changes(stock_data)
+        result = calculate_price_changes(stock_data, block_size=16)
+        assert [(i, j) for i, j, _ in result] == [(i, j) for i, j, _ in expected]
+        np.testing.assert_allclose(
+            [c for _, _, c in result], [c for _, _, c in expected]
+        )
+        assert calculate_price_changes(stock_data, maximal=True) == _merge_overlapping(
+            result
+        )
+        found += len(expected)
+    assert found > 0
+
+
+def test_max_price_change_matches_loop():
+    for seed in range(6):
+        closes = _stock_data(seed, n=80)["收盘"].to_numpy()
+        expected = max(
+            (closes[j] - closes[i]) / closes[i]
+            for i in range(len(closes))
+            for j in range(i + 1, len(closes))
+        )
+        assert np.isclose(max_price_change(closes), expected)
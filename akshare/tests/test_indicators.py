@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+from utils.indicators import HISTORY_SIZE, IndicatorState, load_state, save_state
+
+
+def _bars(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    df = pd.DataFrame(
+        {
+            "日期": pd.bdate_range("2023-01-02", periods=n).date,
+            "最高": close * 1.02,
+            "最低": close * 0.98,
+            "收盘": close,
+            "成交量": rng.uniform(1e5, 5e5, n),
+        }
+    )
+    # 个别缺失值，检验 min_periods 与 EWM 的缺失值处理
+    df.loc[[50, 51, 200, 370], "收盘"] = np.nan
+    df.loc[[120, 300, 380], "成交量"] = np.nan
+    return df
+
+
+def _pandas_indicators(df):
+    """condition_select / get_reverse_trend_stock 中的 pandas 公式"""
+    close, volume = df["收盘"], df["成交量"]
+    high_low = df["最高"] - df["最低"]
+    high_pclose = (df["最高"] - close.shift()).abs()
+    low_pclose = (df["最低"] - close.shift()).abs()
+    true_range = pd.concat([high_low, high_pclose, low_pclose], axis=1).max(axis=1)
+    return {
+        "MA20": close.rolling(window=20).mean(),
+        "STD20": close.rolling(window=20).std(),
+        "ATR": true_range.rolling(window=20).mean(),
+        "Volume_EMA5": volume.ewm(span=10).mean(),
+        "Volume_EMA20": volume.ewm(span=40).mean(),
+        "MA_short": close.rolling(window=5, min_periods=3).mean(),
+        "MA_long": close.rolling(window=20, min_periods=5).mean(),
+        "Vol_EMA_short": volume.ewm(span=5).mean(),
+        "Vol_EMA_long": volume.ewm(span=10).mean(),
+    }
+
+
+def test_incremental_indicators_match_pandas(tmp_path, monkeypatch):
+    df = _bars()
+    expected = _pandas_indicators(df)
+    state = IndicatorState("600000")
+    bars = df.to_dict("records")
+    for bar in bars[:250]:
+        state.update(bar)
+    # 中途保存、读回后继续追加
+    monkeypatch.setattr(
+        "utils.indicators._state_path", lambda symbol, adjust: str(tmp_path / "s.json")
+    )
+    save_state(state)
+    state = load_state("600000")
+    for bar in bars[250:]:
+        state.update(bar)
+
+    for name, series in expected.items():
+        np.testing.assert_allclose(
+            state.latest(name, HISTORY_SIZE),
+            series.iloc[-HISTORY_SIZE:].to_numpy(),
+            rtol=1e-9,
+            err_msg=name,
+        )
@@ -0,0 +1,49 @@
+import numpy as np
+from utils.trend import rolling_fit, window_fit
+
+
+def _values(rows=300, columns=6, seed=0):
+    rng = np.random.default_rng(seed)
+    values = 20 + np.cumsum(rng.normal(0, 0.3, (rows, columns)), axis=0)
+    values[:40, 1] = np.nan  # 上市较晚
+    values[150:160, 2] = np.nan  # 停牌
+    return values
+
+
+def test_window_fit_matches_polyfit():
+    values = _values()
+    start = np.array([0, 40, 100, 200, 10, 298])
+    stop = np.array([300, 300, 140, 260, 11, 300])
+    slope, intercept, last = window_fit(values, start, stop)
+    for j in range(values.shape[1]):
+        y = values[start[j] : stop[j], j]
+        if len(y) < 2:
+            assert np.isnan(slope[j])
+            continue
+        x = np.arange(len(y))
+        expected_slope, expected_intercept = np.polyfit(x, y, 1)
+        assert np.isclose(slope[j], expected_slope)
+        assert np.isclose(intercept[j], expected_intercept)
+        assert np.isclose(last[j], expected_slope * (len(y) - 1) + expected_intercept)
+
+
+def test_window_fit_nan_when_window_has_gap():
+    values = _values()
+    slope, _, _ = window_fit(values, np.full(6, 140), np.full(6, 170))
+    assert np.isnan(slope[2]) and not np.isnan(slope[[0, 1, 3, 4, 5]]).any()
+
+
+def test_rolling_fit_matches_polyfit():
+    values = _values()
+    window = 30
+    slope, intercept, _ = rolling_fit(values, window)
+    assert np.isnan(slope[: window - 1]).all()
+    for t in range(window - 1, len(values), 7):
+        for j in range(values.shape[1]):
+            y = values[t - window + 1 : t + 1, j]
+            if np.isnan(y).any():
+                assert np.isnan(slope[t, j])
+                continue
+            expected_slope, expected_intercept = np.polyfit(np.arange(window), y, 1)
+            assert np.isclose(slope[t, j], expected_slope)
+            assert np.isclose(intercept[t, j], expected_intercept)
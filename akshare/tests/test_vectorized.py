@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+from condition_select import LOOKBACK_DAYS, check_conditions
+from get_reverse_trend_stock import LOOKBACK_DAYS as REVERSAL_LOOKBACK_DAYS
+from get_reverse_trend_stock import check_reversal_conditions
+from sideways_consilidation_break_through import BOX_LOOKBACK
+from sideways_consilidation_break_through import LOOKBACK_DAYS as BOX_LOOKBACK_DAYS
+from sideways_consilidation_break_through import check_box_breakout_conditions
+from utils.vectorized import (
+    check_box_breakout_panel,
+    check_conditions_panel,
+    check_reversal_conditions_panel,
+    panel_frames,
+)
+
+LOOKBACKS = (20, 250)
+
+
+def _stock_data(n, breakout, seed):
+    """在 10 元附近横盘的日线，最后 5 根放量；breakout 时最后一根收在箱体上沿之上"""
+    rng = np.random.default_rng(seed)
+    close = 10 + rng.uniform(-0.5, 0.5, n)
+    volume = np.full(n, 1000.0)
+    volume[-5:] = 3000.0
+    high, low = close + 0.2, close - 0.2
+    if breakout:
+        close[-1], high[-1] = 12.0, 12.1
+    return pd.DataFrame({"最高": high, "最低": low, "收盘": close, "成交量": volume})
+
+
+def _frames(stocks):
+    """靠底对齐的面板（与 panel_frames 的返回值相同），历史较短的股票顶部为 nan"""
+    rows = max(len(df) for df in stocks.values())
+    frames = {}
+    for field, column in [
+        ("high", "最高"),
+        ("low", "最低"),
+        ("close", "收盘"),
+        ("volume", "成交量"),
+    ]:
+        values = np.full((rows, len(stocks)), np.nan)
+        for j, df in enumerate(stocks.values()):
+            values[rows - len(df) :, j] = df[column].to_numpy()
+        frames[field] = pd.DataFrame(values, columns=list(stocks))
+    return frames
+
+
+def test_box_breakout_panel_fires_and_matches_scalar():
+    stocks = {
+        "600000": _stock_data(300, breakout=True, seed=1),
+        "600001": _stock_data(300, breakout=False, seed=2),
+        # 历史不足 250 根，只能按 20 日箱体判断
+        "600002": _stock_data(100, breakout=True, seed=3),
+    }
+    hits = check_box_breakout_panel(_frames(stocks), LOOKBACKS)
+
+    assert hits.loc[250].tolist() == [True, False, False]
+    assert hits.loc[20].tolist() == [True, False, True]
+    for lookback in LOOKBACKS:
+        for symbol, df in stocks.items():
+            expected = check_box_breakout_conditions(df, symbol, lookback)
+            assert bool(hits.loc[lookback, symbol]) == expected
+
+
+def test_box_breakout_panel_matches_per_symbol(synthetic_panel, history):
+    # 按脚本实际的回看期取数据，回看期需容纳 BOX_LOOKBACK + 1 根K线
+    frames = panel_frames(synthetic_panel, BOX_LOOKBACK_DAYS, synthetic_panel.dates[-1])
+    hits = check_box_breakout_panel(frames, (BOX_LOOKBACK,)).loc[BOX_LOOKBACK]
+    expected = {
+        symbol: bool(
+            check_box_breakout_conditions(history(symbol, BOX_LOOKBACK_DAYS), symbol)
+        )
+        for symbol in synthetic_panel.symbols
+    }
+    assert hits.to_dict() == expected
+    assert hits.any() and not hits.all()
+
+
+def test_check_conditions_panel_matches_per_symbol(synthetic_panel, history):
+    frames = panel_frames(synthetic_panel, LOOKBACK_DAYS, synthetic_panel.dates[-1])
+    for percentile_window in (None, 120):
+        hits = check_conditions_panel(frames, percentile_window=percentile_window)
+        expected = {
+            symbol: bool(
+                check_conditions(
+                    history(symbol, LOOKBACK_DAYS), percentile_window=percentile_window
+                )
+            )
+            for symbol in synthetic_panel.symbols
+        }
+        assert hits.to_dict() == expected
+        assert hits.any() and not hits.all()
+
+
+def test_check_reversal_conditions_panel_matches_per_symbol(synthetic_panel, history):
+    frames = panel_frames(
+        synthetic_panel, REVERSAL_LOOKBACK_DAYS, synthetic_panel.dates[-1]
+    )
+    hits = check_reversal_conditions_panel(frames)
+    expected = {
+        symbol: bool(check_reversal_conditions(history(symbol, REVERSAL_LOOKBACK_DAYS)))
+        for symbol in synthetic_panel.symbols
+    }
+    assert hits.to_dict() == expected
+    assert hits.any() and not hits.all()
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+# 单位换算：列按 (源列, 单位) 给出时除以对应倍数
+UNITS = {"万": 1e4, "亿": 1e8}
+
+# A股代码均为6位数字，直接用作整数 id
+_ID_SPACE = 1_000_000
+
+
+def symbol_ids(codes):
+    """股票代码转为整数 id，非6位数字代码为 -1"""
+    codes = pd.Series(codes, dtype=object)
+    try:
+        ids = codes.astype(np.int64).to_numpy()
+    except (ValueError, TypeError):
+        ids = pd.to_numeric(codes, errors="coerce").fillna(-1).to_numpy(np.int64)
+    return np.where((ids >= 0) & (ids < _ID_SPACE), ids, -1)
+
+
+def align(tables, key="代码", how="left"):
+    """
+    按股票代码把多张行情快照、排名表对齐成一张宽表，代替连续的 pd.merge。
+    第一张表的每只股票按整数 id 记下行号，其余各表只做一次 id 到行号的数组查找，
+    需要的列直接按行号写入结果，不再逐次哈希字符串键、复制已合并的全部列。
+    :param tables: [(表, 列)]，列为 {输出列: 源列} 或 {输出列: (源列, 单位)}，
+                   单位为 UNITS 中的名称，换算时源列先转为数值（无法转换的为 nan）
+    :param how: "left" 保留第一张表的全部股票，其余表中没有的为 nan；
+                "inner" 只保留所有表中都有的股票
+    :return: DataFrame（第一列为 key，其余按 tables 中各列的顺序）
+    """
+    base = tables[0][0]
+    codes = base[key].to_numpy()
+    rows = np.full(_ID_SPACE, -1, dtype=np.int64)
+    base_ids = symbol_ids(codes)
+    valid = base_ids >= 0
+    rows[base_ids[valid]] = np.flatnonzero(valid)
+
+    present = np.ones(len(codes), dtype=bool)
+    data = {key: codes}
+    for i, (df, columns) in enumerate(tables):
+        if i == 0:
+            index = np.arange(len(codes))
+        else:
+            ids = symbol_ids(df[key].to_numpy())
+            index = np.where(ids >= 0, rows[ids.clip(0)], -1)
+        found = index >= 0
+        if how == "inner":
+            present &= np.bincount(index[found], minlength=len(codes)) > 0
+        for name, source in columns.items():
+            source, unit = source if isinstance(source, tuple) else (source, None)
+            values = df[source]
+            if unit:
+                values = pd.to_numeric(values, errors="coerce") / UNITS[unit]
+            values = values.to_numpy()
+            if values.dtype.kind in "iuf":
+                result = np.full(len(codes), np.nan)
+            else:
+                result = np.full(len(codes), None, dtype=object)
+            result[index[found]] = values[found]
+            data[name] = result
+    return pd.DataFrame(data)[present].reset_index(drop=True)
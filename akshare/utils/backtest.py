@@ -0,0 +1,248 @@
+import numpy as np
+import pandas as pd
+from utils.extrema import rolling_max
+from utils.trend import window_fit
+from utils.vectorized import bollinger_width, low_percentile_signal, reversal_days
+
+# 每年交易日数，用于把各选股脚本按自然日的回看期折算为K线数
+TRADING_DAYS_PER_YEAR = 243
+
+# 信号之后的持有K线数
+FORWARD_HORIZONS = (1, 5, 20)
+
+
+def lookback_bars(lookback_days):
+    return int(lookback_days * TRADING_DAYS_PER_YEAR / 365)
+
+
+class BarFrames:
+    """
+    把面板转换为按K线序号排列的 DataFrame：每列为一只股票自己的K线（停牌日不占位），
+    第 t 行即该股票的第 t + 1 根K线。在此之上按列做的滚动、EWM 等运算只用到
+    当前及之前的K线，没有未来数据；结果再用 to_dates 放回交易日 × 股票的位置。
+    """
+
+    def __init__(
+        self,
+        panel,
+        start_date=None,
+        end_date=None,
+        fields=("high", "low", "close", "volume"),
+    ):
+        dates = panel._date_slice(start_date, end_date)
+        self.dates = pd.to_datetime(panel.dates[dates], format="%Y%m%d")
+        self.symbols = panel.symbols
+        valid = ~np.isnan(panel.field("close", start_date, end_date).T)
+        # 有K线的位置稳定排序到顶部
+        self.order = np.argsort(~valid, axis=0, kind="stable")
+        self.valid = np.take_along_axis(valid, self.order, axis=0)
+        self.frames = {}
+        for field in fields:
+            values = panel.field(field, start_date, end_date).T.astype(np.float64)
+            values = np.take_along_axis(values, self.order, axis=0)
+            values[~self.valid] = np.nan
+            self.frames[field] = pd.DataFrame(values, columns=self.symbols)
+
+    def __getitem__(self, field):
+        return self.frames[field]
+
+    def bar_count(self, lookback=None):
+        """每个位置可用的K线数（上市以来的K线数，不超过 lookback）"""
+        count = np.arange(1, len(self.valid) + 1)[:, None]
+        if lookback:
+            count = np.minimum(count, lookback)
+        return np.broadcast_to(count, self.valid.shape)
+
+    def to_dates(self, values, fill=False):
+        """把按K线序号排列的结果放回交易日 × 股票的位置"""
+        values = np.where(self.valid, np.asarray(values), fill)
+        result = np.full(values.shape, fill, dtype=values.dtype)
+        np.put_along_axis(result, self.order, values, axis=0)
+        return pd.DataFrame(result, index=self.dates, columns=self.symbols)
+
+
+def condition_signals(
+    bars,
+    lookback=lookback_bars(2000),
+    ma_window=20,
+    consolidation_lookback=60,
+    breakout_lookback=20,
+    amplitude_lookback=60,
+    volume_compare_window=10,
+    bollinger_threshold=0.15,
+    amplitude_threshold=0.3,
+    price_quantile=0.2,
+    percentile_window=None,
+):
+    """
+    每根K线上的 condition_select.check_conditions，参数含义与其相同
+    :param lookback: 每个时点可用的历史K线数（对应 LOOKBACK_DAYS），价格分位在此窗口内计算
+    """
+    high, low, close, volume = bars["high"], bars["low"], bars["close"], bars["volume"]
+    has_history = bars.bar_count(lookback) >= 250
+
+    width_max = (
+        bollinger_width(close, ma_window)
+        .rolling(consolidation_lookback, min_periods=1)
+        .max()
+    )
+    # 近期最高不含当前K线
+    recent_high = high.shift().rolling(breakout_lookback - 1, min_periods=1).max()
+    recent_low = low.rolling(amplitude_lookback, min_periods=1).min()
+    amplitude = (recent_high - recent_low) / recent_low.where(recent_low > 0)
+
+    ema_short = volume.ewm(span=volume_compare_window).mean()
+    ema_long = volume.ewm(span=volume_compare_window * 4).mean()
+    is_volume_growing = (
+        ema_short.rolling(volume_compare_window, min_periods=1).mean()
+        > ema_long.rolling(volume_compare_window, min_periods=1).mean()
+    ) & (
+        ema_short.pct_change(fill_method=None)
+        .rolling(volume_compare_window, min_periods=1)
+        .mean()
+        > 0
+    )
+
+    is_low_percentile = low_percentile_signal(
+        close, price_quantile, percentile_window or lookback
+    )
+
+    return (
+        has_history
+        & (width_max < bollinger_threshold)
+        & (amplitude < amplitude_threshold)
+        & is_volume_growing
+        & is_low_percentile
+    )
+
+
+def _window_mean(values, window, min_periods):
+    """反转窗口内 rolling(window, min_periods) 的均值：窗口被截短时退化为窗口内全部K线的均值"""
+    if window < min_periods:
+        return values * np.nan
+    return values.rolling(window).mean()
+
+
+def _window_ewm_tail_mean(values, span, days, tail=5):
+    """
+    从 days 根K线之前重新开始的 EWM（adjust=True）最近 tail 个值的均值。
+    由全历史 EWM 的未归一化分子 S(t) = x(t) + w·S(t-1) 减去窗口起点之前的部分得到。
+    """
+    decay = 1 - 2 / (span + 1)
+    steps = np.arange(1, len(values) + 1)[:, None]
+    numerator = values.ewm(span=span).mean() * ((1 - decay**steps) / (1 - decay))
+    before = numerator.shift(days).fillna(0.0)
+    means = [
+        (numerator.shift(m) - decay ** (days - m) * before)
+        / ((1 - decay ** (days - m)) / (1 - decay))
+        for m in range(tail)
+    ]
+    return sum(means) / tail
+
+
+def reversal_signals(
+    bars,
+    lookback=lookback_bars(365 * 3),
+    downtrend_period=365 * 3,
+    reversal_window=21,
+    ma_short=5,
+    ma_long=20,
+    downtrend_slope_threshold=-0.0003,
+    volume_increase_ratio=1.1,
+):
+    """
+    每根K线上的 get_reverse_trend_stock.check_reversal_conditions，参数含义与其相同
+    :param lookback: 每个时点可用的历史K线数（对应 LOOKBACK_DAYS），决定下跌段的长度
+    """
+    close, volume = bars["close"], bars["volume"]
+    count = bars.bar_count(lookback)
+    days = reversal_days(reversal_window)
+
+    # 每个时点各自长度的下跌段：[t + 1 - n, t + 1 - days) 中的最后 downtrend_days 根
+    downtrend_days = np.minimum(int(downtrend_period * 0.7), count - 5)
+    stop = np.arange(1, len(close) + 1)[:, None] - days
+    start = np.maximum(
+        np.arange(1, len(close) + 1)[:, None] - count, stop - downtrend_days
+    )
+    stop = np.maximum(stop, start)
+    slope, intercept, trendline = window_fit(close.to_numpy(), start, stop)
+    is_downtrend = (stop - start >= 10) & (slope < downtrend_slope_threshold)
+
+    # 原函数在最近 days 根K线内计算均线，窗口不足均线周期时均线只覆盖窗口内的K线
+    ma_cross = (
+        _window_mean(close, min(ma_short, days), 3)
+        > _window_mean(close, min(ma_long, days), 5)
+    ) & (
+        _window_mean(close, min(ma_short, days - 2), 3).shift(2)
+        < _window_mean(close, min(ma_long, days - 2), 5).shift(2)
+    )
+    is_volume_increase = _window_ewm_tail_mean(volume, 5, days) > (
+        _window_ewm_tail_mean(volume, 10, days) * volume_increase_ratio
+    )
+    return (count >= 120) & is_downtrend & ma_cross & is_volume_increase
+
+
+def box_breakout_signals(bars, box_lookback=250):
+    """每根K线上的 sideways_consilidation_break_through.check_box_breakout_conditions"""
+    high, close, volume = bars["high"], bars["close"], bars["volume"]
+    volume_ema_short = volume.ewm(span=5).mean()
+    volume_ema_long = volume.ewm(span=20).mean()
+    is_volume_growing = (
+        volume_ema_short.rolling(5, min_periods=1).mean()
+        > volume_ema_long.rolling(5, min_periods=1).mean()
+    )
+    # 箱体取到前一根K线为止，与 utils.extrema.panel_box_levels 的 breakout 一致
+    box_high = rolling_max(high.shift().to_numpy(), box_lookback)
+    return (bars.bar_count() > box_lookback) & is_volume_growing & (close > box_high)
+
+
+# 可回测的选股条件：名称 -> 每根K线上的信号函数
+SIGNALS = {
+    "condition_select": condition_signals,
+    "get_reverse_trend_stock": reversal_signals,
+    "sideways_consilidation_break_through": box_breakout_signals,
+}
+
+
+def signal_stats(bars, signals, horizons=FORWARD_HORIZONS):
+    """
+    信号出现后持有 h 根K线的收益统计，与全部K线的平均收益对比
+    :param signals: 按K线序号排列的布尔 DataFrame（各信号函数的返回值）
+    """
+    close = bars["close"]
+    hits = np.asarray(signals, dtype=bool) & bars.valid
+    rows = {}
+    for h in horizons:
+        forward = (close.shift(-h) / close - 1).to_numpy()
+        returns = forward[hits]
+        returns = returns[~np.isnan(returns)]
+        rows[f"{h}日"] = {
+            "信号数": len(returns),
+            "平均收益": returns.mean() if len(returns) else np.nan,
+            "中位收益": np.median(returns) if len(returns) else np.nan,
+            "胜率": (returns > 0).mean() if len(returns) else np.nan,
+            "全部平均收益": np.nanmean(forward),
+        }
+    return pd.DataFrame(rows).T
+
+
+def backtest(
+    panel,
+    name,
+    start_date=None,
+    end_date=None,
+    horizons=FORWARD_HORIZONS,
+    **params,
+):
+    """
+    对历史上每个交易日运行选股条件
+    :param name: SIGNALS 中的选股条件名称
+    :param start_date: 面板起始日期，之前的K线不可用（信号需要足够的预热K线）
+    :param params: 传给信号函数的参数
+    :return: (布尔信号矩阵（交易日 × 股票），远期收益统计)
+    """
+    bars = BarFrames(panel, start_date, end_date)
+    signals = SIGNALS[name](bars, **params)
+    return bars.to_dates(np.asarray(signals, dtype=bool)), signal_stats(
+        bars, signals, horizons
+    )
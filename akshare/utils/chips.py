@@ -0,0 +1,283 @@
+import os
+import numpy as np
+import pandas as pd
+from utils.store import DATA_DIR
+
+# 每只股票的价格网格点数，与东方财富筹码分布的精度一致
+CHIP_BINS = 150
+
+# 从零计算筹码分布时使用的交易日数
+CHIP_LOOKBACK = 120
+
+# 网格两端累计不足总量该比例的筹码视为可以忽略
+CHIP_NEGLIGIBLE = 1e-4
+
+# 有效筹码所占价格区间不足网格范围的该比例时，把网格收缩到有效区间
+CHIP_TRIM_RATIO = 0.5
+
+
+def _chips_path(adjust):
+    return os.path.join(DATA_DIR, "chips", adjust or "none", "chips.npz")
+
+
+class ChipState:
+    """
+    全市场筹码分布（换手率衰减模型）：每只股票在 [low, high] 上均匀取 CHIP_BINS 个价格点
+    （价格超出时扩大，旧价格上的筹码衰减殆尽后收缩），
+    每个交易日先把已有筹码按换手率衰减，再按当日 开高低收均价 为峰、最高最低价为底的
+    三角形分布补入同等比例的新筹码。所有股票一起按数组运算，每日更新为常数次向量运算。
+    """
+
+    def __init__(self, symbols, low, high, chips, last_close, last_date=None):
+        self.symbols = list(symbols)
+        self.low = low
+        self.high = high
+        self.chips = chips
+        self.last_close = last_close
+        self.last_date = last_date
+
+    @classmethod
+    def empty(cls, symbols):
+        n = len(symbols)
+        return cls(
+            symbols,
+            np.full(n, np.nan),
+            np.full(n, np.nan),
+            np.zeros((n, CHIP_BINS)),
+            np.full(n, np.nan),
+        )
+
+    def _prices(self):
+        """每只股票的价格网格（股票 × CHIP_BINS）"""
+        step = (self.high - self.low) / (CHIP_BINS - 1)
+        return self.low[:, None] + step[:, None] * np.arange(CHIP_BINS)
+
+    def _regrid(self, rows, low, high):
+        """把 rows 中股票的已有筹码按累计分布插值到 [low, high] 的新网格上"""
+        old_prices = self._prices()[rows]
+        self.low[rows], self.high[rows] = low, high
+        new_prices = self._prices()[rows]
+        for k, i in enumerate(rows):
+            if old_prices[k, -1] > old_prices[k, 0]:
+                cum = np.cumsum(self.chips[i])
+                new_cum = np.interp(new_prices[k], old_prices[k], cum, left=0.0)
+                # 新网格以外的筹码并入两端的价格点，总量不变
+                new_cum[-1] = cum[-1]
+                self.chips[i] = np.diff(new_cum, prepend=0.0)
+            else:
+                # 原网格只有一个价格（如上市以来全是一字板）
+                total = self.chips[i].sum()
+                self.chips[i] = 0.0
+                self.chips[i, np.abs(new_prices[k] - old_prices[k, 0]).argmin()] = total
+
+    def _expand(self, low, high):
+        """当日价格超出网格范围的股票，把已有筹码插值到扩大后的网格上"""
+        new_low = np.fmin(self.low, low)
+        new_high = np.fmax(self.high, high)
+        rows = np.flatnonzero((new_low < self.low) | (new_high > self.high))
+        self._regrid(rows, new_low[rows], new_high[rows])
+        self.low, self.high = new_low, new_high
+
+    def _trim(self):
+        """
+        旧价格上的筹码按换手率衰减到可以忽略后，只扩不缩的网格会越来越稀；
+        有效筹码所占区间不足网格范围的 CHIP_TRIM_RATIO 时把网格收缩到该区间
+        """
+        total = self.chips.sum(axis=1)
+        cum = np.cumsum(self.chips, axis=1)
+        eps = (total * CHIP_NEGLIGIBLE)[:, None]
+        first = (cum <= eps).sum(axis=1).clip(0, CHIP_BINS - 1)
+        last = (cum < total[:, None] - eps).sum(axis=1).clip(0, CHIP_BINS - 1)
+        prices = self._prices()
+        index = np.arange(len(total))
+        low, high = prices[index, first], prices[index, last]
+        with np.errstate(invalid="ignore"):
+            trim = (
+                (total > 0)
+                & (high > low)
+                & (high - low < (self.high - self.low) * CHIP_TRIM_RATIO)
+            )
+        rows = np.flatnonzero(trim)
+        if len(rows):
+            self._regrid(rows, low[rows], high[rows])
+
+    def update(self, open_, high, low, close, turnover, date=None):
+        """
+        追加一个交易日（各参数为与 symbols 对齐的数组，停牌为 nan）
+        :param turnover: 换手率（%）
+        """
+        traded = ~np.isnan(close)
+        self._expand(np.where(traded, low, np.nan), np.where(traded, high, np.nan))
+        prices = self._prices()
+        avg = ((open_ + high + low + close) / 4)[:, None]
+        low_, high_ = low[:, None], high[:, None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rising = (prices - low_) / np.maximum(avg - low_, 1e-12)
+            falling = (high_ - prices) / np.maximum(high_ - avg, 1e-12)
+        weights = np.where(prices <= avg, rising, falling)
+        weights = np.where((prices >= low_) & (prices <= high_), weights, 0.0)
+        weights = np.nan_to_num(np.clip(weights, 0.0, 1.0))
+        # 一字板等价格区间小于网格间距的，全部筹码落在最接近均价的价格点上
+        flat = weights.sum(axis=1) == 0
+        nearest = np.abs(prices - avg).argmin(axis=1)
+        weights[flat] = 0.0
+        weights[flat, nearest[flat]] = 1.0
+        weights /= weights.sum(axis=1, keepdims=True)
+
+        rate = np.where(traded, np.clip(np.nan_to_num(turnover) / 100, 0.0, 1.0), 0.0)
+        self.chips = self.chips * (1 - rate[:, None]) + weights * rate[:, None]
+        self.last_close = np.where(traded, close, self.last_close)
+        self._trim()
+        if date is not None:
+            self.last_date = date
+
+    def _cost_at(self, cum, share):
+        """累计筹码达到 share 时的价格"""
+        index = (cum < share[:, None]).sum(axis=1).clip(0, CHIP_BINS - 1)
+        return self._prices()[np.arange(len(index)), index]
+
+    def metrics(self, prices=None):
+        """
+        :param prices: 计算获利比例用的价格（与 symbols 对齐），默认最新收盘价
+        :return: DataFrame（代码、获利比例、90集中度、70集中度、平均成本），
+                 与 ak.stock_cyq_em 最后一行的同名字段含义相同
+        """
+        prices = self.last_close if prices is None else np.asarray(prices, float)
+        total = self.chips.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cum = np.cumsum(self.chips, axis=1) / total[:, None]
+            step = (self.high - self.low) / (CHIP_BINS - 1)
+            position = np.where(
+                step > 0,
+                np.floor((prices - self.low) / step),
+                np.where(prices >= self.low, CHIP_BINS - 1, -1),
+            )
+        below = np.clip(np.nan_to_num(position, nan=-1), -1, CHIP_BINS - 1).astype(int)
+        profit = np.where(below >= 0, cum[np.arange(len(below)), below.clip(0)], 0.0)
+
+        result = {"代码": self.symbols, "获利比例": profit}
+        for band in (90, 70):
+            tail = np.full(len(total), (1 - band / 100) / 2)
+            low_cost = self._cost_at(cum, tail)
+            high_cost = self._cost_at(cum, 1 - tail)
+            result[f"{band}集中度"] = (high_cost - low_cost) / (high_cost + low_cost)
+        result["平均成本"] = self._cost_at(cum, np.full(len(total), 0.5))
+        df = pd.DataFrame(result)
+        return df[total > 0].reset_index(drop=True)
+
+    def merge(self, other):
+        """用 other 中的股票覆盖本状态（复权重建的股票），新股票追加在末尾"""
+        index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        new = [s for s in other.symbols if s not in index]
+        if new:
+            extra = ChipState.empty(new)
+            self.symbols += new
+            self.low = np.concatenate([self.low, extra.low])
+            self.high = np.concatenate([self.high, extra.high])
+            self.chips = np.vstack([self.chips, extra.chips])
+            self.last_close = np.concatenate([self.last_close, extra.last_close])
+            index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        rows = [index[s] for s in other.symbols]
+        self.low[rows] = other.low
+        self.high[rows] = other.high
+        self.chips[rows] = other.chips
+        self.last_close[rows] = other.last_close
+
+
+def _panel_arrays(panel, rows, dates):
+    fields = ("open", "high", "low", "close", "turnover")
+    return [
+        panel.values[panel.fields.index(f), rows, dates].astype(np.float64)
+        for f in fields
+    ]
+
+
+def build_chips(panel, lookback=CHIP_LOOKBACK, end_date=None, symbols=None):
+    """
+    用面板最近 lookback 个交易日从零计算筹码分布
+    :param symbols: 只计算这些股票，默认全部
+    """
+    symbols = panel.symbols if symbols is None else list(symbols)
+    rows = [panel.symbol_index[s] for s in symbols]
+    dates = panel._date_slice(None, end_date)
+    dates = slice(max(dates.start, dates.stop - lookback), dates.stop)
+    open_, high, low, close, turnover = _panel_arrays(panel, rows, dates)
+
+    state = ChipState.empty(symbols)
+    # 先用整个区间的价格范围建网格，计算过程中无需再扩大
+    with np.errstate(all="ignore"):
+        state.low = np.nanmin(low, axis=1)
+        state.high = np.nanmax(high, axis=1)
+    for d in range(close.shape[1]):
+        state.update(open_[:, d], high[:, d], low[:, d], close[:, d], turnover[:, d])
+    state.last_date = panel.dates[dates.stop - 1]
+    return state
+
+
+def update_chips(state, panel):
+    """把面板中 state.last_date 之后的交易日逐日追加到筹码分布上，面板中的新股票一并加入"""
+    known = set(state.symbols)
+    new = [s for s in panel.symbols if s not in known]
+    if new:
+        state.merge(ChipState.empty(new))
+    rows = [panel.symbol_index.get(s) for s in state.symbols]
+    listed = np.array([r is not None for r in rows])
+    start = int(np.searchsorted(panel.dates, state.last_date, side="right"))
+    dates = slice(start, len(panel.dates))
+    arrays = _panel_arrays(panel, [r for r in rows if r is not None], dates)
+    for d in range(dates.stop - dates.start):
+        # 已退市、不在面板中的股票按停牌处理
+        day = [np.full(len(rows), np.nan) for _ in arrays]
+        for full, part in zip(day, arrays):
+            full[listed] = part[:, d]
+        state.update(*day, date=panel.dates[start + d])
+    return state
+
+
+def save_chips(state, adjust="qfq"):
+    path = _chips_path(adjust)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp.npz"
+    np.savez(
+        tmp_path,
+        symbols=np.array(state.symbols),
+        low=state.low,
+        high=state.high,
+        chips=state.chips.astype(np.float32),
+        last_close=state.last_close,
+        last_date=np.array(state.last_date or ""),
+    )
+    os.replace(tmp_path, path)
+
+
+def load_chips(adjust="qfq"):
+    """读取本地筹码分布，不存在时返回 None"""
+    path = _chips_path(adjust)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return ChipState(
+            data["symbols"].tolist(),
+            data["low"],
+            data["high"],
+            data["chips"].astype(np.float64),
+            data["last_close"],
+            str(data["last_date"]) or None,
+        )
+
+
+def refresh_chips(panel, rebuilt=(), adjust="qfq"):
+    """
+    每日同步后更新筹码分布：已有状态只追加新交易日；
+    复权重建的股票历史价格已变，用面板从零重算
+    """
+    state = load_chips(adjust)
+    if state is None or not state.last_date:
+        state = build_chips(panel)
+    else:
+        update_chips(state, panel)
+        rebuilt = [s for s in rebuilt if s in panel.symbol_index]
+        if rebuilt:
+            state.merge(build_chips(panel, symbols=rebuilt))
+    save_chips(state, adjust)
+    return state
@@ -0,0 +1,253 @@
+"""
+选股表达式：用一行或多行文本描述条件，在本地面板上按列向量化计算
+
+    ma(close, 5) > ma(close, 10) and ema(volume, 5) > 1.1 * ema(volume, 10)
+
+多行时每行一个表达式，可用 "名称 = 表达式" 定义中间量供后续行引用，
+最后一行为选股条件。所有行中相同的子表达式（如多处出现的 ma(close, 20)）只计算一次。
+
+    python -m utils.expr "close > hhv(ref(high, 1), 20) and volume > 2 * ma(volume, 20)"
+"""
+
+import ast
+import sys
+import pandas as pd
+from utils.panel import PANEL_FIELDS, load_panel
+from utils.trend import rolling_fit
+from utils.vectorized import panel_frames, percentile_rank
+
+
+def _window(n):
+    if not float(n).is_integer() or n < 1:
+        raise ValueError(f"窗口长度必须是正整数：{n}")
+    return int(n)
+
+
+def _slope(x, n):
+    slope, intercept, trendline = rolling_fit(x.to_numpy(), _window(n))
+    return pd.DataFrame(slope, index=x.index, columns=x.columns)
+
+
+# 可用函数：名称 -> (实现, 参数个数)；除第一个参数外均须为数字常量
+FUNCTIONS = {
+    "ma": (lambda x, n: x.rolling(_window(n)).mean(), 2),
+    "std": (lambda x, n: x.rolling(_window(n)).std(), 2),
+    "ema": (lambda x, n: x.ewm(span=n).mean(), 2),
+    "sum": (lambda x, n: x.rolling(_window(n)).sum(), 2),
+    "hhv": (lambda x, n: x.rolling(_window(n)).max(), 2),
+    "llv": (lambda x, n: x.rolling(_window(n)).min(), 2),
+    "ref": (lambda x, n: x.shift(_window(n)), 2),
+    "quantile": (lambda x, q, n: x.rolling(_window(n)).quantile(q), 3),
+    "rank": (lambda x, n: percentile_rank(x, _window(n)), 2),
+    "slope": (_slope, 2),
+    "abs": (lambda x: x.abs(), 1),
+}
+
+_BINARY = {
+    ast.Add: lambda a, b: a + b,
+    ast.Sub: lambda a, b: a - b,
+    ast.Mult: lambda a, b: a * b,
+    ast.Div: lambda a, b: a / b,
+    ast.Pow: lambda a, b: a**b,
+}
+
+_COMPARE = {
+    ast.Gt: lambda a, b: a > b,
+    ast.GtE: lambda a, b: a >= b,
+    ast.Lt: lambda a, b: a < b,
+    ast.LtE: lambda a, b: a <= b,
+    ast.Eq: lambda a, b: a == b,
+    ast.NotEq: lambda a, b: a != b,
+}
+
+_ALLOWED = (
+    ast.BoolOp,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.Compare,
+    ast.And,
+    ast.Or,
+    ast.Not,
+    ast.USub,
+    ast.UAdd,
+    *_BINARY,
+    *_COMPARE,
+)
+
+
+def _is_series(node):
+    """内联后的表达式是否引用了面板字段（否则计算结果为常量而不是 DataFrame）"""
+    if isinstance(node, ast.Name):
+        return True
+    if isinstance(node, ast.Call):
+        return _is_series(node.args[0])
+    return any(_is_series(child) for child in ast.iter_child_nodes(node))
+
+
+class Expression:
+    """
+    编译后的选股表达式。语法是 Python 表达式的子集，只允许数字、面板字段
+    （open/high/low/close/volume/amount/turnover）、已定义的名称、FUNCTIONS 中的函数、
+    四则运算与乘方、比较（可连写）以及 and/or/not。
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.outputs = {}
+        for line in text.strip().splitlines():
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            tree = ast.parse(line, mode="exec").body
+            if len(tree) != 1:
+                raise SyntaxError(f"每行只能有一个表达式：{line}")
+            statement = tree[0]
+            if isinstance(statement, ast.Assign):
+                if len(statement.targets) != 1 or not isinstance(
+                    statement.targets[0], ast.Name
+                ):
+                    raise SyntaxError(f"只能给单个名称赋值：{line}")
+                name, node = statement.targets[0].id, statement.value
+            elif isinstance(statement, ast.Expr):
+                name, node = line, statement.value
+            else:
+                raise SyntaxError(f"不支持的语句：{line}")
+            # 引用已定义名称的地方直接替换为其表达式，使公共子表达式能跨行识别
+            node = self._inline(node, line)
+            if not _is_series(node):
+                raise ValueError(f"表达式不含面板字段，结果为常量：{line}")
+            self.outputs[name] = node
+        if not self.outputs:
+            raise SyntaxError("表达式为空")
+
+    @property
+    def condition(self):
+        """最后一行为选股条件"""
+        return list(self.outputs)[-1]
+
+    def _inline(self, node, line):
+        if isinstance(node, ast.Name):
+            if node.id in self.outputs:
+                return self.outputs[node.id]
+            if node.id not in PANEL_FIELDS:
+                raise NameError(f"未知名称 {node.id}：{line}")
+            return node
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+                raise NameError(f"未知函数 {ast.unparse(node.func)}：{line}")
+            if node.keywords or len(node.args) != FUNCTIONS[node.func.id][1]:
+                raise TypeError(f"{node.func.id} 的参数个数不对：{line}")
+            for arg in node.args[1:]:
+                if not isinstance(arg, ast.Constant):
+                    raise TypeError(f"{node.func.id} 的窗口等参数须为数字：{line}")
+            node.args[0] = self._inline(node.args[0], line)
+            if not _is_series(node.args[0]):
+                raise ValueError(f"{node.func.id} 的第一个参数须含面板字段：{line}")
+            return node
+        if isinstance(node, ast.Constant):
+            if not isinstance(node.value, (int, float)) or isinstance(node.value, bool):
+                raise TypeError(f"只支持数字常量：{line}")
+            return node
+        elif not isinstance(node, _ALLOWED):
+            raise SyntaxError(f"不支持的语法 {type(node).__name__}：{line}")
+        for field, value in ast.iter_fields(node):
+            if isinstance(value, ast.AST):
+                setattr(node, field, self._inline(value, line))
+            elif isinstance(value, list):
+                setattr(
+                    node,
+                    field,
+                    [
+                        self._inline(v, line) if isinstance(v, ast.AST) else v
+                        for v in value
+                    ],
+                )
+        # and/or/not 按位运算，操作数不能是常量
+        if isinstance(node, ast.BoolOp):
+            operands = node.values
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            operands = [node.operand]
+        else:
+            operands = []
+        if not all(_is_series(operand) for operand in operands):
+            raise ValueError(f"and/or/not 的操作数须含面板字段：{line}")
+        return node
+
+    def evaluate(self, frames, cache=None):
+        """
+        :param frames: {字段名: DataFrame}，如 panel_frames 或 utils.backtest.BarFrames 的数据
+        :param cache: 多次调用间共享的 dict，相同子表达式只计算一次
+        :return: {名称: 计算结果 DataFrame}
+        """
+        cache = {} if cache is None else cache
+        return {
+            name: self._eval(node, frames, cache) for name, node in self.outputs.items()
+        }
+
+    def _eval(self, node, frames, cache):
+        if isinstance(node, ast.Constant):
+            return node.value
+        key = ast.dump(node)
+        if key in cache:
+            return cache[key]
+
+        if isinstance(node, ast.Name):
+            result = frames[node.id]
+        elif isinstance(node, ast.Call):
+            func = FUNCTIONS[node.func.id][0]
+            x = self._eval(node.args[0], frames, cache)
+            result = func(x, *(arg.value for arg in node.args[1:]))
+        elif isinstance(node, ast.BinOp):
+            result = _BINARY[type(node.op)](
+                self._eval(node.left, frames, cache),
+                self._eval(node.right, frames, cache),
+            )
+        elif isinstance(node, ast.UnaryOp):
+            operand = self._eval(node.operand, frames, cache)
+            if isinstance(node.op, ast.Not):
+                result = ~operand.astype(bool)
+            else:
+                result = -operand if isinstance(node.op, ast.USub) else operand
+        elif isinstance(node, ast.BoolOp):
+            values = [self._eval(v, frames, cache) for v in node.values]
+            result = values[0].astype(bool)
+            for value in values[1:]:
+                if isinstance(node.op, ast.And):
+                    result = result & value
+                else:
+                    result = result | value
+        else:
+            # 连写的比较 a < b < c 等价于 a < b and b < c
+            left = self._eval(node.left, frames, cache)
+            result = None
+            for op, comparator in zip(node.ops, node.comparators):
+                right = self._eval(comparator, frames, cache)
+                part = _COMPARE[type(op)](left, right)
+                result = part if result is None else result & part
+                left = right
+        cache[key] = result
+        return result
+
+
+def screen(text, panel=None, lookback_days=365, end_date=None):
+    """
+    在本地面板上对全市场计算表达式，返回选股条件（最后一行）在最新一根K线上成立的股票
+    :param lookback_days: 读取的历史自然日数，需覆盖表达式中最长的窗口
+    :return: DataFrame（索引：股票代码，列：各行表达式在最新一根K线上的值）
+    """
+    panel = panel or load_panel()
+    expression = Expression(text)
+    frames = panel_frames(panel, lookback_days, end_date, fields=tuple(panel.fields))
+    latest = pd.DataFrame(
+        {name: result.iloc[-1] for name, result in expression.evaluate(frames).items()}
+    )
+    hits = latest[expression.condition].fillna(False).astype(bool)
+    return latest[hits]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法：python -m utils.expr 表达式 [回看自然日数]")
+        sys.exit(1)
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 365
+    print(screen(sys.argv[1].replace("\\n", "\n"), lookback_days=days))
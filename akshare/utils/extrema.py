@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+# 常用的箱体长度（K线数）
+BOX_LOOKBACKS = (20, 60, 120, 250)
+
+
+def _van_herk(values, window, op):
+    """
+    van Herk/Gil-Werman 滚动极值：按 window 分块求块内前缀和后缀极值，
+    任一窗口恰好跨越一个块边界，取两者的极值即可，与窗口长度无关，每个元素 3 次比较
+    """
+    total = len(values)
+    pad = (-total) % window
+    tail = values.shape[1:]
+    blocks = np.concatenate([values, np.full((pad,) + tail, np.nan)]).reshape(
+        (-1, window) + tail
+    )
+    prefix = op.accumulate(blocks, axis=1).reshape((-1,) + tail)[:total]
+    suffix = op.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape((-1,) + tail)
+    result = np.full(values.shape, np.nan)
+    if window <= total:
+        result[window - 1 :] = op(suffix[: total - window + 1], prefix[window - 1 :])
+    return result
+
+
+def rolling_max(values, window):
+    """
+    滚动最高值（含当前行），values 为一维或二维数组（交易日 × 股票），按列计算；
+    窗口内缺失值被跳过，窗口内全部缺失时为 nan
+    """
+    return _van_herk(np.asarray(values, dtype=np.float64), window, np.fmax)
+
+
+def rolling_min(values, window):
+    """滚动最低值，参数同 rolling_max"""
+    return _van_herk(np.asarray(values, dtype=np.float64), window, np.fmin)
+
+
+def panel_box_levels(high, low, close, lookbacks=BOX_LOOKBACKS):
+    """
+    全市场每根K线上各回看长度的箱体，箱体含当前K线
+    :param high: 最高价 DataFrame（交易日 × 股票），如 panel_frames 的返回值
+    :return: {回看长度: {"high", "low", "width", "breakout": DataFrame}}
+    """
+    boxes = {}
+    valid = high.notna().to_numpy()
+    filled = np.vstack([np.zeros((1, valid.shape[1])), np.cumsum(valid, axis=0)])
+    stop = np.arange(1, len(valid) + 1)
+    for n in lookbacks:
+        # 窗口内有效K线不足 n 根时（上市不久）箱体无意义
+        enough = filled[stop] - filled[np.maximum(stop - n, 0)] >= n
+        box_high = np.where(enough, rolling_max(high.to_numpy(), n), np.nan)
+        box_low = np.where(enough, rolling_min(low.to_numpy(), n), np.nan)
+        box_high = pd.DataFrame(box_high, index=high.index, columns=high.columns)
+        box_low = pd.DataFrame(box_low, index=high.index, columns=high.columns)
+        boxes[n] = {
+            "high": box_high,
+            "low": box_low,
+            "width": (box_high - box_low) / box_low,
+            "breakout": close > box_high.shift(),
+        }
+    return boxes
@@ -0,0 +1,362 @@
+import time
+import random
+import queue
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 各接口每秒请求数上限（全局共享，所有线程、所有任务一起计数）
+RATE_LIMITS = {
+    "stock_zh_a_hist": 20,
+    "stock_individual_fund_flow": 10,
+    "stock_intraday_em": 10,
+    "stock_cyq_em": 5,
+}
+DEFAULT_RATE = 10
+
+# 可重试的错误：网络异常和超时（requests 的异常和 TimeoutError 都是 OSError 的子类），
+# KeyError、ValueError 等由返回数据或代码引起，重试不会成功
+RETRYABLE_ERRORS = (OSError, asyncio.TimeoutError)
+
+# 为 False 时不限流、不调整并发、重试不退避，用于回放存档（没有真实请求）
+_throttled = True
+
+
+def set_throttled(enabled):
+    """开启或关闭全部限流、自适应并发和重试退避"""
+    global _throttled
+    _throttled = enabled
+
+
+class TokenBucket:
+    """令牌桶限流，线程安全，既可在线程中阻塞等待，也可在协程中异步等待"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self):
+        """取一个令牌，返回还需等待的秒数（0 表示已取到）"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def wait(self):
+        while True:
+            delay = self._take()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    async def acquire(self):
+        while True:
+            delay = self._take()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(endpoint):
+    """获取接口对应的全局令牌桶"""
+    with _buckets_lock:
+        if endpoint not in _buckets:
+            _buckets[endpoint] = TokenBucket(RATE_LIMITS.get(endpoint, DEFAULT_RATE))
+        return _buckets[endpoint]
+
+
+def rate_limited(endpoint):
+    """在调用接口前阻塞等待令牌，用于线程中的同步调用"""
+    if _throttled:
+        get_bucket(endpoint).wait()
+
+
+class AdaptiveLimiter:
+    """
+    AIMD 自适应并发控制：请求成功且延迟正常时并发数缓慢加一（每轮 +1），
+    出现错误、超时或延迟明显升高（上游开始限流）时并发数减半。
+    每次减半后至少观察一轮（当前并发数个完成的请求）再决定是否继续减小。
+    """
+
+    def __init__(
+        self,
+        initial=10,
+        min_limit=2,
+        max_limit=64,
+        backoff=0.5,
+        latency_tolerance=2.0,
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.completed = 0
+        self.errors = 0
+        self.short_latency = None  # 近期延迟（快速 EWMA）
+        self.long_latency = None  # 基准延迟（慢速 EWMA）
+        self.started = time.monotonic()
+        self._since_decrease = 0
+        self._condition = asyncio.Condition()
+
+    @property
+    def concurrency(self):
+        return int(self.limit)
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency, ok):
+        async with self._condition:
+            self.in_flight -= 1
+            self.completed += 1
+            self._since_decrease += 1
+            if ok:
+                self._observe_latency(latency)
+            else:
+                self.errors += 1
+
+            congested = not ok or (
+                self.short_latency > self.long_latency * self.latency_tolerance
+            )
+            if congested:
+                if self._since_decrease >= self.limit:
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self._since_decrease = 0
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def _observe_latency(self, latency):
+        if self.short_latency is None:
+            self.short_latency = self.long_latency = latency
+        else:
+            self.short_latency += 0.3 * (latency - self.short_latency)
+            self.long_latency += 0.02 * (latency - self.long_latency)
+
+    def metrics(self):
+        """当前并发数、在途请求数、吞吐量（个/秒）、错误率和延迟"""
+        elapsed = time.monotonic() - self.started
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "throughput": self.completed / elapsed if elapsed > 0 else 0.0,
+            "error_rate": self.errors / self.completed if self.completed else 0.0,
+            "latency": self.short_latency,
+        }
+
+
+class FetchReport:
+    """一次批量抓取的进度与失败汇总"""
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.retries = 0
+        self.failed = {}
+        self.started = time.monotonic()
+        self.limiter = None
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def throughput(self):
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self):
+        text = (
+            f"完成 {self.done - len(self.failed)}/{self.total}，失败 {len(self.failed)}，"
+            f"重试 {self.retries} 次，耗时 {self.elapsed:.1f} 秒，"
+            f"吞吐 {self.throughput:.1f} 个/秒"
+        )
+        if self.limiter is not None:
+            text += f"，最终并发 {self.limiter.concurrency}"
+        return text
+
+
+async def _fetch_one(
+    loop, executor, func, args, limiter, bucket, report, retries, timeout
+):
+    error = None
+    future = None
+    for attempt in range(retries + 1):
+        if future is None:
+            if attempt:
+                report.retries += 1
+                if _throttled:
+                    # 抖动的指数退避
+                    await asyncio.sleep(2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+            if bucket is not None:
+                await bucket.acquire()
+            if limiter is not None:
+                await limiter.acquire()
+            started = time.monotonic()
+            held = limiter is not None
+            future = loop.run_in_executor(executor, func, *args)
+        try:
+            # shield：超时只停止等待，线程中的调用不会被取消
+            result = await asyncio.wait_for(asyncio.shield(future), timeout)
+        except Exception as e:
+            error = e
+            if held:
+                await limiter.release(time.monotonic() - started, ok=False)
+                held = False
+            if not future.done():
+                # 超时的调用仍在运行：下一轮继续等它，不重复发起同一请求
+                continue
+            if not isinstance(e, RETRYABLE_ERRORS):
+                # 数据或代码错误重试也是同样结果，直接记为失败
+                break
+            future = None
+        else:
+            if held:
+                await limiter.release(time.monotonic() - started, ok=True)
+            report.done += 1
+            return result
+
+    report.done += 1
+    report.failed[args] = repr(error)
+    return None
+
+
+def _normalize(items):
+    return [args if isinstance(args, tuple) else (args,) for args in items]
+
+
+async def iter_fetch_async(
+    func,
+    items,
+    endpoint=None,
+    concurrency=10,
+    max_concurrency=64,
+    retries=3,
+    timeout=60,
+    report=None,
+):
+    """
+    并发执行阻塞的抓取函数，按完成顺序逐个产出 (args, result)，
+    带全局限流、自适应并发、超时和抖动指数退避重试；失败的 result 为 None。
+    只重试 RETRYABLE_ERRORS；超时的调用在后台线程中结束前不会重新发起，
+    同一组参数任何时刻最多只有一个调用在运行
+    :param func: 阻塞函数，如 process_stock
+    :param items: 参数元组列表，每个元组调用一次 func(*args)
+    :param endpoint: 按该接口的全局限流计数，None 表示由 func 内部自行限流
+    :param concurrency: 初始并发数，运行中按延迟和错误率在 [2, max_concurrency] 间调整
+    :param report: 传入 FetchReport 可在迭代过程中读取进度
+    """
+    items = _normalize(items)
+    report = report or FetchReport(len(items))
+    if _throttled:
+        report.limiter = AdaptiveLimiter(
+            initial=min(concurrency, max_concurrency), max_limit=max_concurrency
+        )
+    bucket = get_bucket(endpoint) if endpoint and _throttled else None
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    async def run(args):
+        result = await _fetch_one(
+            loop,
+            executor,
+            func,
+            args,
+            report.limiter,
+            bucket,
+            report,
+            retries,
+            timeout,
+        )
+        return args, result
+
+    tasks = [asyncio.ensure_future(run(args)) for args in items]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        # 超时的线程仍可能在运行，不等待它们结束
+        executor.shutdown(wait=False)
+
+
+async def fetch_all_async(func, items, **kwargs):
+    """
+    与 iter_fetch_async 参数相同，等全部完成后一次返回
+    :return: (与 items 对齐的结果列表，失败为 None；FetchReport)
+    """
+    items = _normalize(items)
+    report = kwargs.pop("report", None) or FetchReport(len(items))
+    results = {}
+    async for args, result in iter_fetch_async(func, items, report=report, **kwargs):
+        results[args] = result
+    return [results.get(args) for args in items], report
+
+
+def print_report(report):
+    print(report.summary())
+    for args, error in report.failed.items():
+        print(f"Error processing {args}: {error}")
+
+
+def fetch_all(func, items, **kwargs):
+    """fetch_all_async 的同步入口，失败的参数会打印在汇总之后"""
+    results, report = asyncio.run(fetch_all_async(func, items, **kwargs))
+    print_report(report)
+    return results, report
+
+
+def stream_fetch(func, items, report=None, **kwargs):
+    """
+    iter_fetch_async 的同步生成器入口：事件循环在后台线程中运行，
+    每完成一个就产出 (args, result)，调用方可以边扫描边处理结果。
+    提前结束迭代时会取消尚未开始的任务。
+    """
+    items = _normalize(items)
+    report = report or FetchReport(len(items))
+    pairs = queue.Queue()
+    stop = threading.Event()
+    finished = object()
+
+    async def pump():
+        async for pair in iter_fetch_async(func, items, report=report, **kwargs):
+            if stop.is_set():
+                break
+            pairs.put(pair)
+
+    def run():
+        try:
+            asyncio.run(pump())
+        except BaseException as e:
+            pairs.put(e)
+        finally:
+            pairs.put(finished)
+
+    threading.Thread(target=run, daemon=True).start()
+    try:
+        while True:
+            pair = pairs.get()
+            if pair is finished:
+                break
+            if isinstance(pair, BaseException):
+                raise pair
+            yield pair
+    finally:
+        stop.set()
@@ -0,0 +1,169 @@
+import os
+import json
+import akshare as ak
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from utils.fetch import fetch_all, rate_limited
+from utils.store import DATA_DIR, settled_end_date, trade_dates
+
+# 本地保存的资金流字段：各类订单的净流入额（元）
+FLOW_FIELDS = ("主力", "超大单", "大单", "中单", "小单")
+
+FLOW_COLUMNS = [f"{name}净流入" for name in FLOW_FIELDS]
+
+_FLOW_DIR = os.path.join(DATA_DIR, "fund_flow")
+_FLOW_PATH = os.path.join(_FLOW_DIR, "daily.parquet")
+_META_PATH = os.path.join(_FLOW_DIR, "_meta.json")
+
+
+def load_fund_flow():
+    """本地资金流日表（日期、代码、各类净流入），不存在时返回空表"""
+    if not os.path.exists(_FLOW_PATH):
+        return pd.DataFrame(columns=["日期", "代码", *FLOW_COLUMNS])
+    return pd.read_parquet(_FLOW_PATH)
+
+
+def load_flow_meta():
+    """同步元数据：已同步到的交易日、已下载过历史的股票、股票名称"""
+    if not os.path.exists(_META_PATH):
+        return {"last_date": None, "symbols": [], "names": {}}
+    with open(_META_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save(df, meta):
+    os.makedirs(_FLOW_DIR, exist_ok=True)
+    df = df.drop_duplicates(["日期", "代码"], keep="last")
+    df = df.sort_values(["日期", "代码"]).reset_index(drop=True)
+    tmp_path = _FLOW_PATH + ".tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, _FLOW_PATH)
+    tmp_path = _META_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, _META_PATH)
+
+
+def fetch_history(symbol, end_date):
+    """单只股票近期（约100个交易日）的每日资金流，只保留 end_date 及之前的"""
+    market = "sh" if symbol.startswith("6") else "sz"
+    rate_limited("stock_individual_fund_flow")
+    df = ak.stock_individual_fund_flow(stock=symbol, market=market)
+    df["日期"] = pd.to_datetime(df["日期"]).dt.strftime("%Y%m%d")
+    df = df[df["日期"] <= end_date]
+    result = pd.DataFrame({"日期": df["日期"], "代码": symbol})
+    for column in FLOW_COLUMNS:
+        result[column] = pd.to_numeric(df[f"{column}-净额"], errors="coerce")
+    return result
+
+
+def fetch_today(trade_date):
+    """
+    一次请求全市场当日资金流（ak.stock_individual_fund_flow_rank 的"今日"排名表）
+    :return: (资金流表, {代码: 名称})
+    """
+    df = ak.stock_individual_fund_flow_rank(indicator="今日")
+    result = pd.DataFrame({"日期": trade_date, "代码": df["代码"]})
+    for column in FLOW_COLUMNS:
+        result[column] = pd.to_numeric(df[f"今日{column}-净额"], errors="coerce")
+    # 停牌股票没有资金流
+    result = result.dropna(subset=FLOW_COLUMNS, how="all")
+    return result, dict(zip(df["代码"], df["名称"]))
+
+
+def sync_fund_flow(symbols=None):
+    """
+    增量同步每日资金流：每天只请求一次"今日"排名表追加当日数据；
+    首次同步、本地未下载过的股票逐只下载 ak.stock_individual_fund_flow 的近期历史；
+    同步中断超过一个交易日或在收盘前补同步时，已有历史的股票也逐只下载，
+    但只取排名表补不上的那几个交易日
+    :param symbols: 需要下载历史的股票，默认为"今日"排名表中的全部股票
+    :return: 本地资金流日表
+    """
+    today = datetime.now().strftime("%Y%m%d")
+    dates = trade_dates(today)
+    # 今天是交易日且尚未收盘时，排名表是盘中数据，不能记为已定型交易日的资金流
+    is_live = dates[-1] > settled_end_date(today)
+    if is_live:
+        dates = dates[:-1]
+    trade_date = dates[-1]
+    meta = load_flow_meta()
+    df = load_fund_flow()
+    if meta["last_date"] == trade_date:
+        return df
+
+    latest, names = fetch_today(trade_date)
+    if symbols is None:
+        symbols = list(names)
+    if is_live:
+        latest = latest.iloc[:0]
+    known = set(meta["symbols"])
+    missing = sorted(set(symbols) - known)
+    # 本地最后交易日之后、排名表又补不上的交易日
+    gap = []
+    if meta["last_date"] is not None:
+        covered = set(latest["日期"])
+        gap = [d for d in dates if d > meta["last_date"] and d not in covered]
+    filling = sorted(known) if gap else []
+
+    parts = [df, latest]
+    targets = missing + filling
+    if targets:
+        print(
+            f"下载 {len(missing)} 只股票的资金流历史，"
+            f"补齐 {len(filling)} 只股票缺失的 {len(gap)} 个交易日"
+        )
+        results, report = fetch_all(
+            fetch_history, [(symbol, trade_date) for symbol in targets]
+        )
+        for symbol, result in zip(targets, results):
+            if result is None:
+                # 缺失日期没补上的股票，下次重新下载完整历史
+                known.discard(symbol)
+                continue
+            if symbol in known:
+                result = result[result["日期"].isin(gap)]
+            parts.append(result)
+            known.add(symbol)
+        meta["symbols"] = sorted(known)
+    parts = [part for part in parts if not part.empty] or [df]
+    df = pd.concat(parts, ignore_index=True)
+    meta["names"].update(names)
+    meta["last_date"] = trade_date
+    _save(df, meta)
+    return load_fund_flow()
+
+
+def flow_matrix(df, column="主力净流入"):
+    """
+    长表转为 交易日 × 股票 的矩阵（停牌、未上市为 nan）；
+    sync_fund_flow 会补齐中断的交易日，行即为首个同步日以来的全部交易日
+    """
+    return df.pivot(index="日期", columns="代码", values=column).sort_index()
+
+
+def recent_flows(flow, days=10):
+    """
+    最近 days 个交易日（flow 的最后 days 行）每只股票的净流入，一次对全市场计算；
+    最新交易日没有资金流（停牌、退市）的股票不计入
+    :param flow: flow_matrix 的返回值
+    :return: DataFrame（索引：股票代码，列：1..days，1 为最新交易日），停牌日、上市前为 nan
+    """
+    if len(flow):
+        flow = flow.loc[:, flow.iloc[-1].notna()]
+    values = flow.to_numpy(dtype=np.float64)[::-1]
+    recent = np.full((days, values.shape[1]), np.nan)
+    rows = min(days, len(values))
+    recent[:rows] = values[:rows]
+    return pd.DataFrame(recent.T, index=flow.columns, columns=range(1, days + 1))
+
+
+def window_sums(flow, windows=(1, 3, 5, 10)):
+    """
+    每只股票最近 n 个交易日的净流入合计，n 可以是任意长度；
+    窗口内停牌日、上市前没有资金流，按 0 计入（recent_flows 已排除最新交易日停牌的股票）
+    :return: DataFrame（索引：股票代码，列：各窗口长度）
+    """
+    cumulative = recent_flows(flow, max(windows)).T.fillna(0.0).cumsum()
+    return pd.DataFrame({n: cumulative.loc[n] for n in windows})
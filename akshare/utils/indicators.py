@@ -0,0 +1,304 @@
+import os
+import json
+import math
+from datetime import datetime
+from utils.store import DATA_DIR, load_meta, read_cross_section, read_hist
+
+# 逐日增量维护的指标，与各选股脚本中的 pandas 公式一一对应：
+# 名称 -> (类型, 输入列, 参数)，均值、标准差的参数为窗口或 (窗口, min_periods)
+INDICATOR_SPECS = {
+    # condition_select.check_conditions
+    "MA20": ("mean", "收盘", 20),
+    "STD20": ("std", "收盘", 20),
+    "ATR": ("atr", None, 20),
+    "Volume_EMA5": ("ewm", "成交量", 10),
+    "Volume_EMA20": ("ewm", "成交量", 40),
+    # get_reverse_trend_stock.check_reversal_conditions 的均线和成交量EMA
+    # （原函数只在反转窗口内计算，这里按全部历史计算同样的公式）
+    "MA_short": ("mean", "收盘", (5, 3)),
+    "MA_long": ("mean", "收盘", (20, 5)),
+    "Vol_EMA_short": ("ewm", "成交量", 5),
+    "Vol_EMA_long": ("ewm", "成交量", 10),
+}
+
+# 每个指标保留最近若干个值，覆盖选股条件中最长的观察期（横盘观察期 60 日）
+HISTORY_SIZE = 60
+
+
+class RollingWindow:
+    """
+    定长滑动窗口的均值和样本标准差，环形缓冲区 + Welford 增删，每根K线 O(1)。
+    与 Series.rolling(window, min_periods).mean()/.std() 相同：窗口内非缺失值
+    少于 min_periods（默认为 window）时结果为 nan。
+    每转满一圈用缓冲区重新计算一次，避免长期增删累积舍入误差。
+    """
+
+    def __init__(self, window, min_periods=None, buffer=None, pos=0):
+        self.window = window
+        self.min_periods = min_periods or window
+        self.buffer = buffer or []
+        self.pos = pos
+        self._recompute()
+
+    def _recompute(self):
+        values = [x for x in self.buffer if not math.isnan(x)]
+        self.count = len(values)
+        self.mean = sum(values) / self.count if self.count else 0.0
+        self.m2 = sum((x - self.mean) ** 2 for x in values)
+
+    def _add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    def _remove(self, x):
+        if self.count == 1:
+            self.count, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        old_mean = self.mean
+        self.count -= 1
+        self.mean = (old_mean * (self.count + 1) - x) / self.count
+        self.m2 -= (x - old_mean) * (x - self.mean)
+
+    def update(self, x):
+        if len(self.buffer) < self.window:
+            self.buffer.append(x)
+        else:
+            old = self.buffer[self.pos]
+            self.buffer[self.pos] = x
+            if not math.isnan(old):
+                self._remove(old)
+        self.pos = (self.pos + 1) % self.window
+        if self.pos == 0:
+            self._recompute()
+        elif not math.isnan(x):
+            self._add(x)
+
+    @property
+    def full(self):
+        return self.count >= self.min_periods
+
+    def get_mean(self):
+        return self.mean if self.full else math.nan
+
+    def get_std(self):
+        if not self.full or self.count < 2:
+            return math.nan
+        return math.sqrt(max(self.m2, 0.0) / (self.count - 1))
+
+    def to_dict(self):
+        return {
+            "window": self.window,
+            "min_periods": self.min_periods,
+            "buffer": self.buffer,
+            "pos": self.pos,
+        }
+
+
+class EWM:
+    """
+    Series.ewm(span=span).mean() 的增量版本（adjust=True，ignore_na=False）：
+    分子、分母各自按 1 - alpha 衰减，缺失值只衰减不累加
+    """
+
+    def __init__(self, span, numerator=0.0, denominator=0.0):
+        self.span = span
+        self.decay = 1 - 2 / (span + 1)
+        self.numerator = numerator
+        self.denominator = denominator
+
+    def update(self, x):
+        self.numerator *= self.decay
+        self.denominator *= self.decay
+        if not math.isnan(x):
+            self.numerator += x
+            self.denominator += 1
+
+    def get(self):
+        return self.numerator / self.denominator if self.denominator else math.nan
+
+    def to_dict(self):
+        return {
+            "span": self.span,
+            "numerator": self.numerator,
+            "denominator": self.denominator,
+        }
+
+
+class ATR:
+    """真实波幅（需要前一日收盘价）的滑动均值，第一根K线的真实波幅为最高 - 最低"""
+
+    def __init__(self, window, prev_close=None, tr=None):
+        self.prev_close = prev_close
+        self.tr = RollingWindow(window, **(tr or {}))
+
+    def update(self, high, low, close):
+        ranges = [high - low]
+        if self.prev_close is not None:
+            ranges += [abs(high - self.prev_close), abs(low - self.prev_close)]
+        ranges = [r for r in ranges if not math.isnan(r)]
+        self.tr.update(max(ranges) if ranges else math.nan)
+        self.prev_close = close
+
+    def get(self):
+        return self.tr.get_mean()
+
+    def to_dict(self):
+        tr = self.tr.to_dict()
+        tr.pop("window")
+        tr.pop("min_periods")
+        return {"prev_close": self.prev_close, "tr": tr}
+
+
+def _make(kind, param, saved=None):
+    saved = saved or {}
+    if kind in ("mean", "std"):
+        saved.pop("window", None)
+        saved.pop("min_periods", None)
+        window, min_periods = param if isinstance(param, tuple) else (param, None)
+        return RollingWindow(window, min_periods, **saved)
+    if kind == "ewm":
+        saved.pop("span", None)
+        return EWM(param, **saved)
+    return ATR(param, **saved)
+
+
+class IndicatorState:
+    """
+    单只股票的指标状态：每追加一根K线只做常数次运算，
+    并为每个指标保留最近 HISTORY_SIZE 个值（选股条件需要最近一段的最大值、均值等）
+    """
+
+    def __init__(self, symbol, last_date=None, engines=None, history=None):
+        self.symbol = symbol
+        self.last_date = last_date
+        engines = engines or {}
+        self.engines = {
+            name: _make(kind, param, engines.get(name))
+            for name, (kind, column, param) in INDICATOR_SPECS.items()
+        }
+        self.history = history or {name: [] for name in INDICATOR_SPECS}
+
+    def update(self, bar):
+        """
+        追加一根K线
+        :param bar: 含 日期/最高/最低/收盘/成交量 的行（dict 或 Series）
+        """
+        for name, (kind, column, param) in INDICATOR_SPECS.items():
+            engine = self.engines[name]
+            if kind == "atr":
+                engine.update(
+                    float(bar["最高"]), float(bar["最低"]), float(bar["收盘"])
+                )
+                value = engine.get()
+            elif kind == "ewm":
+                engine.update(float(bar[column]))
+                value = engine.get()
+            else:
+                engine.update(float(bar[column]))
+                value = engine.get_mean() if kind == "mean" else engine.get_std()
+            values = self.history[name]
+            values.append(value)
+            del values[:-HISTORY_SIZE]
+        self.last_date = str(bar["日期"]).replace("-", "")[:8]
+
+    def latest(self, name, n=1):
+        """最近 n 个值（旧到新），n=1 时直接返回最新值"""
+        values = self.history[name][-n:]
+        return values[-1] if n == 1 else values
+
+    def to_dict(self):
+        return {
+            "symbol": self.symbol,
+            "last_date": self.last_date,
+            "engines": {name: e.to_dict() for name, e in self.engines.items()},
+            "history": self.history,
+        }
+
+
+def _state_path(symbol, adjust):
+    return os.path.join(DATA_DIR, "indicators", adjust or "none", f"{symbol}.json")
+
+
+def load_state(symbol, adjust="qfq"):
+    """读取单只股票的指标状态，不存在时返回 None"""
+    path = _state_path(symbol, adjust)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        saved = json.load(f)
+    if set(saved["engines"]) != set(INDICATOR_SPECS):
+        # 指标定义有增删，旧状态不能续算
+        return None
+    return IndicatorState(
+        saved["symbol"], saved["last_date"], saved["engines"], saved["history"]
+    )
+
+
+def save_state(state, adjust="qfq"):
+    path = _state_path(state.symbol, adjust)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        # nan 按 JSON 扩展写出，json.load 可原样读回
+        json.dump(state.to_dict(), f)
+    os.replace(tmp_path, path)
+
+
+def rebuild_state(symbol, adjust="qfq"):
+    """用本地全部历史从头计算指标状态（新股或复权历史被改写后）"""
+    state = IndicatorState(symbol)
+    for bar in read_hist(symbol, adjust=adjust).to_dict("records"):
+        state.update(bar)
+    save_state(state, adjust)
+    return state
+
+
+def refresh_indicators(symbols, rebuilt=(), adjust="qfq"):
+    """
+    每日同步后刷新指标状态：新增的K线从全市场年表一次读出，
+    各股票只追加自己最后日期之后的K线
+    :param symbols: 需要刷新的股票代码
+    :param rebuilt: 新建或复权重建的股票，从头计算
+    :return: {股票代码: IndicatorState}
+    """
+    rebuilt = set(rebuilt)
+    states = {}
+    for symbol in symbols:
+        state = None if symbol in rebuilt else load_state(symbol, adjust)
+        states[symbol] = state or rebuild_state(symbol, adjust)
+
+    # 只有落后于本地日线的状态需要追加；已退市、停牌的股票不参与，不会拉长读取区间
+    stale = []
+    for state in states.values():
+        meta = load_meta(state.symbol, adjust) or {}
+        if state.last_date and state.last_date < meta.get("last_date", ""):
+            stale.append(state)
+    if not stale:
+        return states
+    # 大多数股票停在同一天，从全市场年表一次读出；落后更多的（如长期停牌后复牌）单独读取
+    start_date = max(s.last_date for s in stale)
+    end_date = datetime.now().strftime("%Y%m%d")
+    bars = read_cross_section(
+        start_date,
+        end_date,
+        adjust,
+        symbols=[s.symbol for s in stale if s.last_date == start_date],
+    )
+    groups = dict(tuple(bars.groupby("股票代码")))
+    for state in stale:
+        if state.last_date == start_date:
+            group = groups.get(state.symbol)
+        else:
+            group = read_hist(state.symbol, state.last_date, adjust=adjust)
+        if group is None:
+            continue
+        updated = False
+        for bar in group.to_dict("records"):
+            if str(bar["日期"]).replace("-", "") > state.last_date:
+                state.update(bar)
+                updated = True
+        if updated:
+            save_state(state, adjust)
+    return states
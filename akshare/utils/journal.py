@@ -0,0 +1,90 @@
+import os
+import json
+import hashlib
+import inspect
+import threading
+from utils.store import DATA_DIR, last_bar
+
+
+class ScanJournal:
+    """
+    全市场扫描的逐股结果日志（JSON Lines，每评估完一只股票追加一行）。
+    同一根最后K线、同一参数的扫描中断后重跑，会跳过日志中已评估的股票：
+    周末、节假日重跑仍复用上一交易日的日志；收盘前（含盘中K线）与收盘后的扫描互不复用。
+    """
+
+    def __init__(self, name, params=None, bar=None):
+        """
+        :param name: 扫描名称，如 "condition_select"
+        :param params: 影响结果的参数，参数不同的扫描互不复用
+        :param bar: 扫描评估的最后一根K线 (交易日 YYYYMMDD, 是否为盘中K线)，
+                    默认按交易日历取当前的（见 utils.store.last_bar）
+        """
+        data_date, live = bar or last_bar()
+        key = json.dumps(
+            {"data_date": data_date, "live": live, "params": params},
+            sort_keys=True,
+            default=str,
+        )
+        digest = hashlib.md5(key.encode("utf-8")).hexdigest()[:8]
+        suffix = "-live" if live else ""
+        self.path = os.path.join(
+            DATA_DIR, "journal", f"{name}-{data_date}{suffix}-{digest}.jsonl"
+        )
+        self.outcomes = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # 进程被杀时最后一行可能只写了一半
+                    continue
+                self.outcomes[entry["symbol"]] = entry["result"]
+
+    def __contains__(self, symbol):
+        return symbol in self.outcomes
+
+    def record(self, symbol, result):
+        line = json.dumps(
+            {"symbol": symbol, "result": result}, ensure_ascii=False, default=str
+        )
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.outcomes[symbol] = result
+
+    def wrap(self, func):
+        """包装 func(symbol, ...)：成功返回后立即记录结果；抛出异常的不记录，下次重跑"""
+
+        def wrapped(symbol, *args):
+            result = func(symbol, *args)
+            self.record(symbol, result)
+            return result
+
+        return wrapped
+
+    def pending(self, items):
+        """过滤掉已评估过的 (symbol, ...) 参数元组"""
+        return [args for args in items if args[0] not in self.outcomes]
+
+    def results(self):
+        """所有已评估股票中的命中结果（含之前中断的运行）"""
+        return [result for result in self.outcomes.values() if result]
+
+
+def check_params(func, **extra):
+    """检查函数各关键字参数的默认值（窗口、阈值等）再加上 extra，用作 ScanJournal 的 params"""
+    params = {
+        name: parameter.default
+        for name, parameter in inspect.signature(func).parameters.items()
+        if parameter.default is not inspect.Parameter.empty
+    }
+    params.update(extra)
+    return params
@@ -0,0 +1,125 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from utils.store import DATA_DIR, market_dir
+
+# 面板字段 -> 日线列名
+PANEL_FIELDS = {
+    "open": "开盘",
+    "high": "最高",
+    "low": "最低",
+    "close": "收盘",
+    "volume": "成交量",
+    "amount": "成交额",
+    "turnover": "换手率",
+}
+
+
+def _panel_dir(adjust):
+    return os.path.join(DATA_DIR, "panel", adjust or "none")
+
+
+def build_panel(adjust="qfq", start_date=None):
+    """
+    把本地全市场年表物化为 float32 内存映射面板（字段 × 股票 × 交易日），
+    停牌、未上市的位置为 nan。按字段存放，取单个字段时只读取该字段的连续区域。
+    :param start_date: 只保留该日期（YYYYMMDD）之后的数据，默认全部
+    :return: MarketPanel；本地还没有全市场年表时返回 None
+    """
+    root = market_dir(adjust)
+    start_year = int(start_date[:4]) if start_date else 0
+    frames = []
+    names = sorted(os.listdir(root)) if os.path.isdir(root) else []
+    for name in names:
+        if name.endswith(".parquet") and int(name[:4]) >= start_year:
+            frames.append(
+                pd.read_parquet(
+                    os.path.join(root, name),
+                    columns=["日期", "股票代码"] + list(PANEL_FIELDS.values()),
+                )
+            )
+    if not frames:
+        print("本地没有全市场年表，请先运行 sync.py")
+        return None
+    df = pd.concat(frames, ignore_index=True)
+    if start_date:
+        df = df[df["日期"] >= pd.Timestamp(start_date).date()]
+
+    symbol_codes, symbols = pd.factorize(df["股票代码"], sort=True)
+    date_codes, dates = pd.factorize(df["日期"], sort=True)
+    shape = (len(PANEL_FIELDS), len(symbols), len(dates))
+
+    panel_dir = _panel_dir(adjust)
+    os.makedirs(panel_dir, exist_ok=True)
+    tmp_path = os.path.join(panel_dir, "panel.npy.tmp")
+    values = np.lib.format.open_memmap(
+        tmp_path, mode="w+", dtype=np.float32, shape=shape
+    )
+    values[:] = np.nan
+    for i, column in enumerate(PANEL_FIELDS.values()):
+        values[i, symbol_codes, date_codes] = df[column].to_numpy(dtype=np.float32)
+    values.flush()
+    del values
+    os.replace(tmp_path, os.path.join(panel_dir, "panel.npy"))
+
+    index = {
+        "symbols": list(symbols),
+        "dates": [d.strftime("%Y%m%d") for d in dates],
+        "fields": list(PANEL_FIELDS),
+    }
+    with open(os.path.join(panel_dir, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    return load_panel(adjust)
+
+
+def load_panel(adjust="qfq"):
+    """以只读内存映射方式打开面板，多个进程通过系统页缓存共享同一份数据"""
+    panel_dir = _panel_dir(adjust)
+    with open(os.path.join(panel_dir, "index.json"), "r", encoding="utf-8") as f:
+        index = json.load(f)
+    values = np.load(os.path.join(panel_dir, "panel.npy"), mmap_mode="r")
+    shape = (len(index["fields"]), len(index["symbols"]), len(index["dates"]))
+    if values.shape != shape:
+        # 旧版面板按 股票 × 交易日 × 字段 存放
+        raise ValueError("面板文件格式已过期，请重新运行 sync.py 生成")
+    return MarketPanel(values, index["symbols"], index["dates"], index["fields"])
+
+
+class MarketPanel:
+    def __init__(self, values, symbols, dates, fields):
+        self.values = values
+        self.symbols = symbols
+        self.dates = dates
+        self.fields = fields
+        self.symbol_index = {symbol: i for i, symbol in enumerate(symbols)}
+        self.date_index = {date: i for i, date in enumerate(dates)}
+
+    def _date_slice(self, start_date=None, end_date=None):
+        start = np.searchsorted(self.dates, start_date) if start_date else 0
+        end = (
+            np.searchsorted(self.dates, end_date, side="right")
+            if end_date
+            else len(self.dates)
+        )
+        return slice(start, end)
+
+    def field(self, name, start_date=None, end_date=None):
+        """单个字段的二维视图（股票 × 交易日），不复制数据"""
+        return self.values[
+            self.fields.index(name), :, self._date_slice(start_date, end_date)
+        ]
+
+    def frame(self, symbol, start_date=None, end_date=None):
+        """
+        单只股票的日线 DataFrame，列名与 ak.stock_zh_a_hist 一致，
+        可直接传给各选股脚本的检查函数
+        """
+        dates = self._date_slice(start_date, end_date)
+        data = self.values[:, self.symbol_index[symbol], dates].T
+        df = pd.DataFrame(
+            data.astype(np.float64), columns=[PANEL_FIELDS[f] for f in self.fields]
+        )
+        df.insert(0, "日期", pd.to_datetime(self.dates[dates], format="%Y%m%d").date)
+        df.insert(1, "股票代码", symbol)
+        return df[~np.isnan(data).all(axis=1)].reset_index(drop=True)
@@ -0,0 +1,175 @@
+"""
+akshare 调用录制与回放，用于离线、可复现地运行和测速选股脚本
+
+录制（真实请求，并把每次调用的结果按函数名和参数存入存档）：
+    python -m utils.recorder record data/replay/20250407.pkl.gz condition_select.py
+回放（不联网、不限流，所有调用都从存档中读取，时钟冻结在录制时刻）：
+    python -m utils.recorder replay data/replay/20250407.pkl.gz condition_select.py
+
+两种模式下本地数据目录都指向一个临时目录，避免本地缓存影响录制内容和回放结果。
+"""
+
+import os
+import sys
+import gzip
+import json
+import pickle
+import types
+import runpy
+import builtins
+import tempfile
+import threading
+import datetime as _datetime
+import akshare as ak
+import pandas as pd
+from utils.fetch import set_throttled
+
+_real_datetime = _datetime.datetime
+_real_import = builtins.__import__
+
+# 只在选股脚本和 utils 模块中冻结时钟，pandas 等第三方库仍使用真实的 datetime
+_SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _call_key(name, args, kwargs):
+    return name + json.dumps([args, sorted(kwargs.items())], default=str)
+
+
+class Recorder:
+    def __init__(self, path, mode):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"未知模式：{mode}")
+        self.path = path
+        self.mode = mode
+        self.calls = {}
+        self.recorded_at = _real_datetime.now()
+        self._lock = threading.Lock()
+        self._originals = {}
+        self._patched = []
+        if mode == "replay":
+            self.load()
+
+    def load(self):
+        with gzip.open(self.path, "rb") as f:
+            archive = pickle.load(f)
+        self.calls = archive["calls"]
+        self.recorded_at = archive["recorded_at"]
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._lock:
+            archive = {"recorded_at": self.recorded_at, "calls": dict(self.calls)}
+        with gzip.open(self.path, "wb") as f:
+            pickle.dump(archive, f, protocol=pickle.HIGHEST_PROTOCOL)
+        print(f"已录制 {len(archive['calls'])} 次调用到 {self.path}")
+
+    def _wrap(self, name, func):
+        def record(*args, **kwargs):
+            result = func(*args, **kwargs)
+            with self._lock:
+                self.calls[_call_key(name, args, kwargs)] = result
+            return _copy(result)
+
+        def replay(*args, **kwargs):
+            key = _call_key(name, args, kwargs)
+            if key not in self.calls:
+                raise KeyError(f"回放存档中没有该调用：{key}")
+            return _copy(self.calls[key])
+
+        return record if self.mode == "record" else replay
+
+    def install(self):
+        """替换 akshare 模块上的所有公开函数，调用方通过 ak.xxx 调用时即被拦截"""
+        for name in dir(ak):
+            func = getattr(ak, name)
+            if name.startswith("_") or not callable(func) or isinstance(func, type):
+                continue
+            self._originals[name] = func
+            setattr(ak, name, self._wrap(name, func))
+        if self.mode == "replay":
+            # 回放没有真实请求，不需要限流和重试退避
+            set_throttled(False)
+            self._patched = _freeze_clock(self.recorded_at)
+
+    def uninstall(self):
+        for name, func in self._originals.items():
+            setattr(ak, name, func)
+        self._originals = {}
+        if self.mode == "replay":
+            set_throttled(True)
+            builtins.__import__ = _real_import
+            for module, value in self._patched:
+                module.datetime = value
+            self._patched = []
+
+
+def _copy(result):
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        return result.copy()
+    return result
+
+
+def _in_scripts(module_globals):
+    path = (module_globals or {}).get("__file__")
+    return bool(path) and os.path.abspath(path).startswith(_SCRIPT_DIR + os.sep)
+
+
+def _freeze_clock(moment):
+    """
+    把选股脚本和 utils 模块中的 datetime.now()/today() 冻结在录制时刻，
+    使按当天日期计算的请求参数与录制时一致。
+    已导入的模块直接替换其 datetime 名称，之后导入的模块在 import 时拿到冻结版本；
+    datetime 模块本身不改动，其他库不受影响。
+    :return: [(模块, 原来的 datetime)]，用于恢复
+    """
+
+    class FrozenDatetime(_real_datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return moment if tz is None else moment.astimezone(tz)
+
+        @classmethod
+        def today(cls):
+            return moment
+
+    frozen = types.ModuleType("datetime")
+    frozen.__dict__.update(_datetime.__dict__)
+    frozen.datetime = FrozenDatetime
+
+    def scoped_import(name, globals=None, locals=None, fromlist=(), level=0):
+        module = _real_import(name, globals, locals, fromlist, level)
+        if module is _datetime and _in_scripts(globals):
+            return frozen
+        return module
+
+    patched = []
+    for module in list(sys.modules.values()):
+        if module is None or not _in_scripts(vars(module)):
+            continue
+        value = getattr(module, "datetime", None)
+        if value is _real_datetime or value is _datetime:
+            patched.append((module, value))
+            module.datetime = FrozenDatetime if value is _real_datetime else frozen
+    builtins.__import__ = scoped_import
+    return patched
+
+
+def run_script(mode, path, script, argv=()):
+    """在录制或回放模式下以 __main__ 方式运行选股脚本"""
+    os.environ["QUANT_DATA_DIR"] = tempfile.mkdtemp(prefix="quant_data_")
+    recorder = Recorder(path, mode)
+    recorder.install()
+    sys.argv = [script, *argv]
+    try:
+        runpy.run_path(script, run_name="__main__")
+    finally:
+        recorder.uninstall()
+        if mode == "record":
+            recorder.save()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print("用法：python -m utils.recorder record|replay 存档路径 脚本 [参数...]")
+        sys.exit(1)
+    run_script(sys.argv[1], sys.argv[2], sys.argv[3], sys.argv[4:])
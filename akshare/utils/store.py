@@ -0,0 +1,381 @@
+import os
+import json
+import shutil
+import akshare as ak
+import pandas as pd
+from datetime import datetime, timedelta
+from utils.fetch import rate_limited
+
+# 本地数据根目录，可通过环境变量 QUANT_DATA_DIR 覆盖
+DATA_DIR = os.environ.get(
+    "QUANT_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"),
+)
+
+# 与 ak.stock_zh_a_hist 返回结果一致的列
+HIST_COLUMNS = [
+    "日期",
+    "股票代码",
+    "开盘",
+    "收盘",
+    "最高",
+    "最低",
+    "成交量",
+    "成交额",
+    "振幅",
+    "涨跌幅",
+    "涨跌额",
+    "换手率",
+]
+
+# 收盘后才认为当日K线已定型
+MARKET_CLOSE_TIME = "15:30"
+
+# 本地无数据时增量同步的默认起始日期（覆盖各选股脚本中最长的回看期）
+DEFAULT_START_DATE = (datetime.now() - timedelta(days=2000)).strftime("%Y%m%d")
+
+# 判断复权价格是否被改写的容差
+ADJUST_TOLERANCE = 1e-4
+
+# 全市场年表的行组大小（约几个交易日），按日期过滤时只需读取少量行组
+MARKET_ROW_GROUP_SIZE = 20000
+
+# 盘中未定型的当日K线只保存在内存中，不写入本地
+_live_bars = {}
+
+
+def _hist_dir(adjust):
+    return os.path.join(DATA_DIR, "hist", adjust or "none")
+
+
+def _symbol_dir(symbol, adjust):
+    return os.path.join(_hist_dir(adjust), symbol)
+
+
+def _to_date(date_str):
+    return datetime.strptime(date_str, "%Y%m%d").date()
+
+
+def list_symbols(adjust="qfq"):
+    """本地已存储的股票代码列表"""
+    root = _hist_dir(adjust)
+    if not os.path.isdir(root):
+        return []
+    return sorted(name for name in os.listdir(root) if not name.startswith("_"))
+
+
+def load_meta(symbol, adjust="qfq"):
+    """读取单只股票的存储元数据（已覆盖的日期区间等），不存在时返回 None"""
+    path = os.path.join(_symbol_dir(symbol, adjust), "_meta.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_meta(symbol, meta, adjust="qfq"):
+    path = os.path.join(_symbol_dir(symbol, adjust), "_meta.json")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def read_hist(symbol, start_date=None, end_date=None, adjust="qfq"):
+    """
+    从本地按年分区的 Parquet 文件读取日线数据
+    :param symbol: 股票代码（6位数字）
+    :param start_date: 开始日期（YYYYMMDD），None 表示不限
+    :param end_date: 结束日期（YYYYMMDD），None 表示不限
+    :return: 与 ak.stock_zh_a_hist 相同列的 DataFrame
+    """
+    symbol_dir = _symbol_dir(symbol, adjust)
+    if not os.path.isdir(symbol_dir):
+        return pd.DataFrame(columns=HIST_COLUMNS)
+
+    start_year = int(start_date[:4]) if start_date else None
+    end_year = int(end_date[:4]) if end_date else None
+    frames = []
+    for name in sorted(os.listdir(symbol_dir)):
+        if not name.endswith(".parquet"):
+            continue
+        year = int(name[:4])
+        if (start_year and year < start_year) or (end_year and year > end_year):
+            continue
+        frames.append(pd.read_parquet(os.path.join(symbol_dir, name)))
+    if not frames:
+        return pd.DataFrame(columns=HIST_COLUMNS)
+
+    df = pd.concat(frames, ignore_index=True)
+    if start_date:
+        df = df[df["日期"] >= _to_date(start_date)]
+    if end_date:
+        df = df[df["日期"] <= _to_date(end_date)]
+    return df.reset_index(drop=True)
+
+
+def _write_partitions(symbol_dir, df):
+    os.makedirs(symbol_dir, exist_ok=True)
+    if df is None or df.empty:
+        return
+
+    df = df[HIST_COLUMNS].copy()
+    df["日期"] = pd.to_datetime(df["日期"]).dt.date
+    years = pd.to_datetime(df["日期"]).dt.year
+    for year, part in df.groupby(years):
+        path = os.path.join(symbol_dir, f"{year}.parquet")
+        if os.path.exists(path):
+            part = pd.concat([pd.read_parquet(path), part], ignore_index=True)
+        part = (
+            part.drop_duplicates(subset="日期", keep="last")
+            .sort_values("日期")
+            .reset_index(drop=True)
+        )
+        tmp_path = path + ".tmp"
+        part.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+
+def write_hist(symbol, df, adjust="qfq", replace=False):
+    """
+    按年分区写入日线数据，与已有分区按日期合并去重
+    :param replace: True 时用 df 替换该股票的全部分区：先完整写入临时目录再换入，
+                    写入中途失败不会丢失已有数据
+    """
+    symbol_dir = _symbol_dir(symbol, adjust)
+    if not replace:
+        _write_partitions(symbol_dir, df)
+        return
+
+    # 以 "_" 开头的目录不会被 list_symbols 当作股票
+    tmp_dir = os.path.join(_hist_dir(adjust), f"_{symbol}.tmp")
+    old_dir = os.path.join(_hist_dir(adjust), f"_{symbol}.old")
+    for path in (tmp_dir, old_dir):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+    _write_partitions(tmp_dir, df)
+    if os.path.isdir(symbol_dir):
+        os.replace(symbol_dir, old_dir)
+    os.replace(tmp_dir, symbol_dir)
+    if os.path.isdir(old_dir):
+        shutil.rmtree(old_dir)
+
+
+def settled_end_date(end_date):
+    """收盘前请求当日数据时，当日K线尚未定型，只把前一日记为已覆盖"""
+    now = datetime.now()
+    today = now.strftime("%Y%m%d")
+    if end_date >= today:
+        if now.strftime("%H:%M") < MARKET_CLOSE_TIME:
+            return (now - timedelta(days=1)).strftime("%Y%m%d")
+        return today
+    return end_date
+
+
+def trade_dates(end_date=None):
+    """截至 end_date（默认今天，含）的交易日列表"""
+    end_date = end_date or datetime.now().strftime("%Y%m%d")
+    dates = pd.to_datetime(ak.tool_trade_date_hist_sina()["trade_date"])
+    dates = dates.dt.strftime("%Y%m%d")
+    return dates[dates <= end_date].tolist()
+
+
+def last_bar(end_date=None):
+    """
+    截至 end_date（默认今天）的最后一根日K线
+    :return: (交易日, 是否为收盘前未定型的K线)
+    """
+    end_date = end_date or datetime.now().strftime("%Y%m%d")
+    trade_date = trade_dates(end_date)[-1]
+    return trade_date, trade_date > settled_end_date(end_date)
+
+
+def _fetch_daily(symbol, start_date, end_date, adjust):
+    rate_limited("stock_zh_a_hist")
+    return ak.stock_zh_a_hist(
+        symbol=symbol,
+        period="daily",
+        start_date=start_date,
+        end_date=end_date,
+        adjust=adjust,
+    )
+
+
+def _split_settled(df, end_date):
+    """拆分为已定型的K线和盘中未定型的K线"""
+    settled_end = _to_date(settled_end_date(end_date))
+    mask = pd.to_datetime(df["日期"]).dt.date <= settled_end
+    return df[mask], df[~mask]
+
+
+def _build_meta(start_date, end_date, df):
+    meta = {"start": start_date, "end": settled_end_date(end_date)}
+    if df is not None and not df.empty:
+        last = df.iloc[-1]
+        meta["last_date"] = pd.Timestamp(last["日期"]).strftime("%Y%m%d")
+        meta["last_close"] = float(last["收盘"])
+    return meta
+
+
+def rebuild_symbol(symbol, start_date, end_date, adjust="qfq"):
+    """
+    全量下载区间内的日线并覆盖本地数据
+    :return: 新的元数据；下载结果为空（网络异常、停牌等）且本地已有数据时保留本地数据，返回 None
+    """
+    df = _fetch_daily(symbol, start_date, end_date, adjust)
+    if df is None or df.empty:
+        if load_meta(symbol, adjust) is not None:
+            return None
+        df = pd.DataFrame(columns=HIST_COLUMNS)
+    df, _live_bars[(symbol, adjust)] = _split_settled(df, end_date)
+    write_hist(symbol, df, adjust, replace=True)
+    meta = _build_meta(start_date, end_date, df)
+    save_meta(symbol, meta, adjust)
+    return meta
+
+
+def sync_symbol(symbol, end_date=None, adjust="qfq", start_date=None):
+    """
+    增量同步单只股票：从本地最后一根K线（含）开始下载，只追加缺失的尾部。
+    重叠的那根K线收盘价与本地不一致时，说明复权历史被除权除息改写，整只股票重建。
+    下载结果为空时（网络异常、停牌、非交易日）保留本地数据，记为 unchanged，下次再同步。
+    :param start_date: 本地尚无数据时的全量下载起始日期
+    :return: (状态, 元数据)，状态为 created/rebuilt/appended/unchanged
+    """
+    end_date = end_date or datetime.now().strftime("%Y%m%d")
+    meta = load_meta(symbol, adjust)
+    if meta is None:
+        start_date = start_date or DEFAULT_START_DATE
+        return "created", rebuild_symbol(symbol, start_date, end_date, adjust)
+
+    def rebuild():
+        rebuilt = rebuild_symbol(symbol, meta["start"], end_date, adjust)
+        return ("rebuilt", rebuilt) if rebuilt else ("unchanged", meta)
+
+    if "last_date" not in meta:
+        local = read_hist(symbol, adjust=adjust)
+        if local.empty:
+            return rebuild()
+        meta.update(_build_meta(meta["start"], meta["end"], local))
+
+    if meta["end"] >= end_date:
+        return "unchanged", meta
+
+    tail = _fetch_daily(symbol, meta["last_date"], end_date, adjust)
+    if tail is None or tail.empty:
+        return "unchanged", meta
+    tail, _live_bars[(symbol, adjust)] = _split_settled(tail, end_date)
+    if tail.empty:
+        return "unchanged", meta
+
+    first = tail.iloc[0]
+    if pd.Timestamp(first["日期"]).strftime("%Y%m%d") != meta["last_date"] or (
+        abs(float(first["收盘"]) - meta["last_close"]) > ADJUST_TOLERANCE
+    ):
+        return rebuild()
+
+    new_rows = tail.iloc[1:]
+    write_hist(symbol, new_rows, adjust)
+    meta = _build_meta(meta["start"], end_date, tail)
+    save_meta(symbol, meta, adjust)
+    return ("appended" if len(new_rows) else "unchanged"), meta
+
+
+def market_dir(adjust):
+    return os.path.join(DATA_DIR, "market", adjust or "none")
+
+
+def build_market(years=None, adjust="qfq"):
+    """
+    把各股票同一年的分区合并成按日期排序的全市场年表，供横截面查询使用
+    :param years: 需要重建的年份列表，默认全部年份
+    """
+    symbols = list_symbols(adjust)
+    if years is None:
+        years = set()
+        for symbol in symbols:
+            years.update(
+                int(name[:4])
+                for name in os.listdir(_symbol_dir(symbol, adjust))
+                if name.endswith(".parquet")
+            )
+
+    root = market_dir(adjust)
+    os.makedirs(root, exist_ok=True)
+    for year in sorted(years):
+        frames = []
+        for symbol in symbols:
+            path = os.path.join(_symbol_dir(symbol, adjust), f"{year}.parquet")
+            if os.path.exists(path):
+                frames.append(pd.read_parquet(path))
+        if not frames:
+            continue
+        df = (
+            pd.concat(frames, ignore_index=True)
+            .sort_values(["日期", "股票代码"])
+            .reset_index(drop=True)
+        )
+        path = os.path.join(root, f"{year}.parquet")
+        tmp_path = path + ".tmp"
+        df.to_parquet(tmp_path, index=False, row_group_size=MARKET_ROW_GROUP_SIZE)
+        os.replace(tmp_path, path)
+
+
+def read_cross_section(start_date, end_date=None, adjust="qfq", symbols=None):
+    """
+    读取某一交易日（或日期区间）的全市场日线，按日期过滤只读取相关的行组
+    :param start_date: 开始日期（YYYYMMDD）
+    :param end_date: 结束日期（YYYYMMDD），默认与开始日期相同
+    :param symbols: 只保留这些股票代码，默认全部
+    :return: 与 ak.stock_zh_a_hist 相同列的 DataFrame
+    """
+    end_date = end_date or start_date
+    start, end = _to_date(start_date), _to_date(end_date)
+    frames = []
+    for year in range(start.year, end.year + 1):
+        path = os.path.join(market_dir(adjust), f"{year}.parquet")
+        if os.path.exists(path):
+            frames.append(
+                pd.read_parquet(
+                    path, filters=[("日期", ">=", start), ("日期", "<=", end)]
+                )
+            )
+    if not frames:
+        return pd.DataFrame(columns=HIST_COLUMNS)
+
+    df = pd.concat(frames, ignore_index=True)
+    if symbols is not None:
+        df = df[df["股票代码"].isin(symbols)]
+    return df.reset_index(drop=True)
+
+
+def stock_zh_a_hist(
+    symbol, period="daily", start_date="19700101", end_date="20500101", adjust=""
+):
+    """
+    ak.stock_zh_a_hist 的本地缓存版本：请求区间已被本地覆盖时直接读取本地文件；
+    只缺尾部时增量同步；起始日期早于本地覆盖范围时全量重建
+    """
+    if period != "daily":
+        rate_limited("stock_zh_a_hist")
+        return ak.stock_zh_a_hist(
+            symbol=symbol,
+            period=period,
+            start_date=start_date,
+            end_date=end_date,
+            adjust=adjust,
+        )
+
+    meta = load_meta(symbol, adjust)
+    if meta is None or start_date < meta["start"]:
+        fetch_end = max(end_date, meta["end"]) if meta else end_date
+        rebuild_symbol(symbol, start_date, fetch_end, adjust)
+    elif meta["end"] < end_date:
+        sync_symbol(symbol, end_date, adjust)
+    df = read_hist(symbol, start_date, end_date, adjust)
+
+    live = _live_bars.get((symbol, adjust))
+    if live is not None and not live.empty:
+        live = live[pd.to_datetime(live["日期"]).dt.date <= _to_date(end_date)]
+        df = pd.concat([df, live[HIST_COLUMNS]], ignore_index=True)
+    return df
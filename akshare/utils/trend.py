@@ -0,0 +1,92 @@
+import numpy as np
+
+
+def _prefix_sums(values, base):
+    """
+    按列的前缀和 Σy、Σt·y 和缺失值个数（首行补 0），t 为行号。
+    先减去每列的基准值，避免长窗口上 Σt·y 过大损失精度。
+    """
+    y = values - base
+    missing = np.isnan(y)
+    y = np.where(missing, 0.0, y)
+    t = np.arange(len(values), dtype=np.float64)[:, None]
+    pad = np.zeros((1, values.shape[1]))
+    return (
+        np.vstack([pad, np.cumsum(y, axis=0)]),
+        np.vstack([pad, np.cumsum(t * y, axis=0)]),
+        np.vstack([pad, np.cumsum(missing, axis=0)]),
+    )
+
+
+def _closed_form(sum_y, sum_ty, start, n, base):
+    """由窗口内的 Σy、Σt·y 求 x = 0..n-1 上的最小二乘直线"""
+    sum_xy = sum_ty - start * sum_y
+    sum_x = n * (n - 1) / 2
+    sum_xx = (n - 1) * n * (2 * n - 1) / 6
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = (n * sum_xy - sum_x * sum_y) / (n * sum_xx - sum_x**2)
+        intercept = (sum_y - slope * sum_x) / n + base
+    return slope, intercept
+
+
+def window_fit(values, start, stop):
+    """
+    按列对各自的窗口 [start, stop) 做一元线性回归（与 np.polyfit(x, y, 1) 相同，
+    x 从窗口第一行起记为 0），各列窗口长度可以不同
+    :param values: 二维数组（交易日 × 股票）
+    :param start: 每列窗口起始行号，整数数组；也可以是二维数组（每行一组窗口），
+                  一次求出每列在多个时点上各自长度的窗口
+    :param stop: 每列窗口结束行号（不含），形状同 start
+    :return: (斜率, 截距, 趋势线在窗口最后一行的值)，形状同 start，
+             窗口少于 2 行或含缺失值的为 nan
+    """
+    values = np.asarray(values, dtype=np.float64)
+    columns = np.arange(values.shape[1])
+    start, stop, _ = np.broadcast_arrays(start, stop, columns)
+    last_row = stop.reshape(-1, len(columns)).max(axis=0) - 1
+    last = values[np.clip(last_row, 0, len(values) - 1), columns]
+    base = np.where(np.isnan(last), 0.0, last)
+
+    cum_y, cum_ty, cum_missing = _prefix_sums(values, base)
+    n = (stop - start).astype(np.float64)
+    slope, intercept = _closed_form(
+        cum_y[stop, columns] - cum_y[start, columns],
+        cum_ty[stop, columns] - cum_ty[start, columns],
+        start,
+        n,
+        base,
+    )
+    invalid = (n < 2) | (cum_missing[stop, columns] > cum_missing[start, columns])
+    slope[invalid] = intercept[invalid] = np.nan
+    return slope, intercept, slope * (n - 1) + intercept
+
+
+def rolling_fit(values, window):
+    """
+    所有交易日上的滚动线性回归：第 t 行为以 t 结尾、长度 window 的窗口的拟合结果
+    :param values: 二维数组（交易日 × 股票）
+    :return: (斜率, 截距, 趋势线在窗口最后一行的值)，均与 values 同形状，不足一个窗口处为 nan
+    """
+    values = np.asarray(values, dtype=np.float64)
+    first_valid = np.argmax(~np.isnan(values), axis=0)
+    base = values[first_valid, np.arange(values.shape[1])]
+    base = np.where(np.isnan(base), 0.0, base)
+
+    cum_y, cum_ty, cum_missing = _prefix_sums(values, base)
+    stop = np.arange(1, len(values) + 1)[:, None]
+    start = stop - window
+    slope = np.full(values.shape, np.nan)
+    intercept = np.full(values.shape, np.nan)
+    if window <= len(values):
+        rows = slice(window - 1, None)
+        s, i = _closed_form(
+            cum_y[window:] - cum_y[:-window],
+            cum_ty[window:] - cum_ty[:-window],
+            start[rows],
+            float(window),
+            base,
+        )
+        missing = cum_missing[window:] > cum_missing[:-window]
+        slope[rows] = np.where(missing, np.nan, s)
+        intercept[rows] = np.where(missing, np.nan, i)
+    return slope, intercept, slope * (window - 1) + intercept
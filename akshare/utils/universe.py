@@ -0,0 +1,73 @@
+import os
+import time
+import threading
+from functools import reduce
+import akshare as ak
+import pandas as pd
+from utils.store import DATA_DIR
+
+# 实时行情快照缓存有效期（秒），可通过环境变量 SPOT_TTL 覆盖
+SPOT_TTL = int(os.environ.get("SPOT_TTL", 300))
+
+_SPOT_PATH = os.path.join(DATA_DIR, "spot", "stock_zh_a_spot_em.parquet")
+_spot_cache = {"time": 0.0, "df": None}
+_spot_lock = threading.Lock()
+
+
+def get_spot(ttl=None):
+    """
+    获取A股实时行情快照（ak.stock_zh_a_spot_em），带TTL缓存。
+    快照同时缓存在内存和本地文件中，先后运行的多个选股脚本共享同一次请求。
+    :param ttl: 缓存有效期（秒），默认 SPOT_TTL；0 表示强制刷新
+    :return: 快照副本，调用方可以随意修改
+    """
+    ttl = SPOT_TTL if ttl is None else ttl
+    with _spot_lock:
+        now = time.time()
+        if _spot_cache["df"] is None or now - _spot_cache["time"] > ttl:
+            if os.path.exists(_SPOT_PATH) and now - os.path.getmtime(_SPOT_PATH) <= ttl:
+                _spot_cache["df"] = pd.read_parquet(_SPOT_PATH)
+                _spot_cache["time"] = os.path.getmtime(_SPOT_PATH)
+            else:
+                df = ak.stock_zh_a_spot_em()
+                os.makedirs(os.path.dirname(_SPOT_PATH), exist_ok=True)
+                tmp_path = _SPOT_PATH + ".tmp"
+                df.to_parquet(tmp_path, index=False)
+                os.replace(tmp_path, _SPOT_PATH)
+                _spot_cache["df"] = df
+                _spot_cache["time"] = now
+        return _spot_cache["df"].copy()
+
+
+# ===== 可组合的向量化过滤条件：每个函数返回布尔Series，用 & | ~ 组合 =====
+def has_price(df):
+    """最新价不为nan（排除停牌、未上市）"""
+    return df["最新价"].notna()
+
+
+def on_board(df, prefixes):
+    """代码以给定前缀开头，如 ("60", "00") 为沪深主板，("30",) 为创业板"""
+    return df["代码"].str.startswith(tuple(prefixes))
+
+
+def is_st(df):
+    """ST、*ST股票"""
+    return df["名称"].str.startswith(("ST", "*ST"))
+
+
+def float_cap_between(df, low=None, high=None):
+    """流通市值（元）在 [low, high] 之间，None 表示不限"""
+    cap = pd.to_numeric(df["流通市值"], errors="coerce")
+    mask = cap.notna()
+    if low is not None:
+        mask &= cap >= low
+    if high is not None:
+        mask &= cap <= high
+    return mask
+
+
+def select(df, *masks):
+    """按所有条件同时满足筛选"""
+    if not masks:
+        return df
+    return df[reduce(lambda a, b: a & b, masks)]
@@ -0,0 +1,305 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from utils.extrema import BOX_LOOKBACKS, panel_box_levels
+from utils.trend import window_fit
+
+
+def align_right(values, valid):
+    """
+    把每列（每只股票）的有效K线压紧并靠底对齐：停牌、未上市造成的空位移到顶部，
+    最后一行即每只股票自己的最新一根K线。这样按列做的滚动计算与逐只股票计算一致。
+    :param values: 二维数组（交易日 × 股票）
+    :param valid: 同形状布尔数组，True 表示该位置有K线
+    """
+    order = np.argsort(valid, axis=0, kind="stable")
+    aligned = np.take_along_axis(values, order, axis=0)
+    aligned[~np.take_along_axis(valid, order, axis=0)] = np.nan
+    return aligned
+
+
+def panel_frames(
+    panel, lookback_days, end_date=None, fields=("high", "low", "close", "volume")
+):
+    """
+    从内存映射面板取出最近 lookback_days 个自然日的数据，转换为靠底对齐的
+    DataFrame（行：距最新K线的位置，列：股票代码），与逐只请求 lookback_days 天历史等价
+    """
+    end = datetime.strptime(end_date, "%Y%m%d") if end_date else datetime.now()
+    start_date = (end - timedelta(days=lookback_days)).strftime("%Y%m%d")
+    close = panel.field("close", start_date, end_date).T
+    valid = ~np.isnan(close)
+    return {
+        field: pd.DataFrame(
+            align_right(
+                panel.field(field, start_date, end_date).T.astype(np.float64), valid
+            ),
+            columns=panel.symbols,
+        )
+        for field in fields
+    }
+
+
+def _cached(cache, key, compute):
+    """cache 为 dict 时按 key 复用中间结果（参数扫描时不同参数组合共享），None 时直接计算"""
+    if cache is None:
+        return compute()
+    if key not in cache:
+        cache[key] = compute()
+    return cache[key]
+
+
+# ===== condition_select.check_conditions 的全市场向量化版本 =====
+# 每个条件函数输入为靠底对齐的 DataFrame（列为股票），输出为按股票的布尔 Series
+def bollinger_width(close, ma_window=20):
+    """每根K线的布林带宽度（标准差 / 均线）"""
+    ma = close.rolling(window=ma_window).mean()
+    std = close.rolling(window=ma_window).std()
+    return std / ma
+
+
+def consolidation_condition(
+    close, ma_window=20, consolidation_lookback=60, bollinger_threshold=0.15
+):
+    """布林带收缩：最近N日布林带宽度的最大值小于阈值"""
+    bollinger_width_max = (
+        bollinger_width(close, ma_window).iloc[-consolidation_lookback:].max()
+    )
+    return bollinger_width_max < bollinger_threshold
+
+
+def amplitude(high, low, breakout_lookback=20, amplitude_lookback=60):
+    """(近期最高 - 近期最低) / 近期最低，近期最低 <= 0 时为 nan"""
+    recent_high = high.iloc[-breakout_lookback:-1].max()
+    recent_low = low.iloc[-amplitude_lookback:].min()
+    return (recent_high - recent_low) / recent_low.where(recent_low > 0)
+
+
+def amplitude_condition(
+    high, low, breakout_lookback=20, amplitude_lookback=60, amplitude_threshold=0.3
+):
+    """振幅小于阈值，近期最低 <= 0 时不满足"""
+    return amplitude(high, low, breakout_lookback, amplitude_lookback) < (
+        amplitude_threshold
+    )
+
+
+def volume_condition(volume, volume_compare_window=10):
+    """成交量放大：短期EMA均值大于长期EMA均值，且短期EMA近期平均增速为正"""
+    ema_short = volume.ewm(span=volume_compare_window).mean()
+    ema_long = volume.ewm(span=volume_compare_window * 4).mean()
+    recent = slice(-volume_compare_window, None)
+    return (ema_short.iloc[recent].mean() > ema_long.iloc[recent].mean()) & (
+        ema_short.pct_change(fill_method=None).iloc[recent].mean() > 0
+    )
+
+
+def low_percentile_condition(close, quantile=0.2, window=None):
+    """当前价格处于最近 window 根K线（None 为全部历史）的分位以下"""
+    recent = close.iloc[-window:] if window else close
+    return close.iloc[-1] < recent.quantile(quantile)
+
+
+def percentile_rank(close, window=None):
+    """
+    每根K线的收盘价在最近 window 根K线（None 为上市以来全部K线）中的百分位排名，
+    取值 (0, 1]。pandas 的滚动排名和分位数用跳表维护窗口内的有序值，
+    每根K线 O(log window)，可一次算出全市场所有历史交易日。
+    :param close: 靠底对齐的收盘价 DataFrame（或单只股票的 Series）
+    """
+    windowed = close.rolling(window) if window else close.expanding()
+    return windowed.rank(pct=True)
+
+
+def low_percentile_signal(close, quantile=0.2, window=None, min_periods=1):
+    """
+    每根K线上的 low_percentile_condition：收盘价低于最近 window 根K线
+    （None 为此前全部K线）的 quantile 分位，最后一行与 low_percentile_condition 相同。
+    K线不足 window 根时与原函数一样在已有的K线内计算。
+    """
+    windowed = (
+        close.rolling(window, min_periods=min_periods)
+        if window
+        else close.expanding(min_periods)
+    )
+    return close < windowed.quantile(quantile)
+
+
+def check_conditions_panel(
+    frames,
+    ma_window=20,
+    consolidation_lookback=60,
+    breakout_lookback=20,
+    amplitude_lookback=60,
+    volume_compare_window=10,
+    bollinger_threshold=0.15,
+    amplitude_threshold=0.3,
+    atr_multiplier=0.3,
+    price_quantile=0.2,
+    percentile_window=None,
+    cache=None,
+):
+    """
+    一次计算全市场的 condition_select.check_conditions，参数含义与其相同。
+    原函数中的 ATR 突破条件没有参与最终结果，这里同样不计算（atr_multiplier 仅为保持签名一致）。
+    :param frames: panel_frames 的返回值
+    :param cache: 在多次调用间共享的 dict，只依赖部分参数的中间结果按这些参数缓存
+    :return: 按股票代码索引的布尔 Series
+    """
+    high, low, close, volume = (
+        frames["high"],
+        frames["low"],
+        frames["close"],
+        frames["volume"],
+    )
+    # 原函数要求至少250根K线
+    has_history = _cached(cache, ("count", 250), lambda: close.count() >= 250)
+    width = _cached(
+        cache, ("bollinger_width", ma_window), lambda: bollinger_width(close, ma_window)
+    )
+    width_max = _cached(
+        cache,
+        ("bollinger_width_max", ma_window, consolidation_lookback),
+        lambda: width.iloc[-consolidation_lookback:].max(),
+    )
+    amplitudes = _cached(
+        cache,
+        ("amplitude", breakout_lookback, amplitude_lookback),
+        lambda: amplitude(high, low, breakout_lookback, amplitude_lookback),
+    )
+    is_volume_growing = _cached(
+        cache,
+        ("volume", volume_compare_window),
+        lambda: volume_condition(volume, volume_compare_window),
+    )
+    is_low_percentile = _cached(
+        cache,
+        ("percentile", price_quantile, percentile_window),
+        lambda: low_percentile_condition(close, price_quantile, percentile_window),
+    )
+    return (
+        has_history
+        & (width_max < bollinger_threshold)
+        & (amplitudes < amplitude_threshold)
+        & is_volume_growing
+        & is_low_percentile
+    )
+
+
+# ===== get_reverse_trend_stock.check_reversal_conditions 的全市场向量化版本 =====
+def reversal_days(reversal_window=21):
+    """与原函数 get_trading_days 相同按 0.7 折算交易日（K线不少于 120 根时不受 5 日缓冲影响）"""
+    days = int(reversal_window * 0.7)
+    if days > 115:
+        raise ValueError("reversal_window 过大，反转窗口会因股票K线数不同而不同")
+    return days
+
+
+def downtrend_slope(close, downtrend_period=365 * 3, reversal_window=21):
+    """
+    反转窗口之前下跌段的趋势斜率，下跌段长度随每只股票的K线数变化，
+    由 utils.trend.window_fit 按列一次求出；下跌段不足 10 根K线时为 nan
+    """
+    total = len(close)
+    n = close.count().to_numpy()
+    days = reversal_days(reversal_window)
+    # 与原函数 get_trading_days 相同：按 0.7 折算交易日，并保留至少 5 日缓冲
+    downtrend_days = np.minimum(int(downtrend_period * 0.7), n - 5)
+
+    # 靠底对齐后，下跌段为倒数 [downtrend_days + reversal_days, reversal_days) 行
+    stop = total - days
+    start = np.maximum(total - n, stop - downtrend_days)
+    slope, intercept, trendline = window_fit(close.to_numpy(), start, stop)
+    slope[stop - start < 10] = np.nan
+    return pd.Series(slope, index=close.columns)
+
+
+def reversal_ma_cross(close, reversal_window=21, ma_short=5, ma_long=20):
+    """反转窗口内短均线在最近 3 日内上穿长均线"""
+    reversal_close = close.iloc[-reversal_days(reversal_window) :]
+    ma_s = reversal_close.rolling(window=ma_short, min_periods=3).mean()
+    ma_l = reversal_close.rolling(window=ma_long, min_periods=5).mean()
+    return (ma_s.iloc[-1] > ma_l.iloc[-1]) & (ma_s.iloc[-3] < ma_l.iloc[-3])
+
+
+def reversal_volume_emas(volume, reversal_window=21):
+    """反转窗口内成交量短期、长期EMA最近5日的均值"""
+    reversal_volume = volume.iloc[-reversal_days(reversal_window) :]
+    vol_ema_short = reversal_volume.ewm(span=5).mean()
+    vol_ema_long = reversal_volume.ewm(span=10).mean()
+    return vol_ema_short.iloc[-5:].mean(), vol_ema_long.iloc[-5:].mean()
+
+
+def check_reversal_conditions_panel(
+    frames,
+    downtrend_period=365 * 3,
+    reversal_window=21,
+    ma_short=5,
+    ma_long=20,
+    volume_compare_window=5,
+    downtrend_slope_threshold=-0.0003,
+    volume_increase_ratio=1.1,
+    ma_spread_threshold=0.02,
+    cache=None,
+):
+    """
+    一次计算全市场的 get_reverse_trend_stock.check_reversal_conditions，参数含义与其相同。
+    :param frames: panel_frames 的返回值（需含 close、volume）
+    :param cache: 同 check_conditions_panel
+    :return: 按股票代码索引的布尔 Series
+    """
+    close, volume = frames["close"], frames["volume"]
+    has_history = _cached(cache, ("count", 120), lambda: close.count() >= 120)
+    slope = _cached(
+        cache,
+        ("downtrend_slope", downtrend_period, reversal_window),
+        lambda: downtrend_slope(close, downtrend_period, reversal_window),
+    )
+    ma_cross = _cached(
+        cache,
+        ("ma_cross", reversal_window, ma_short, ma_long),
+        lambda: reversal_ma_cross(close, reversal_window, ma_short, ma_long),
+    )
+    vol_short, vol_long = _cached(
+        cache,
+        ("volume_emas", reversal_window),
+        lambda: reversal_volume_emas(volume, reversal_window),
+    )
+    return (
+        has_history
+        & (slope < downtrend_slope_threshold)
+        & ma_cross
+        & (vol_short > vol_long * volume_increase_ratio)
+    )
+
+
+# ===== sideways_consilidation_break_through.check_box_breakout_conditions 的向量化版本 =====
+def check_box_breakout_panel(frames, lookbacks=BOX_LOOKBACKS):
+    """
+    一次计算全市场、多个箱体长度的 check_box_breakout_conditions，
+    各箱体长度共用一次成交量计算，箱体由 utils.extrema 的滚动极值得到
+    :param frames: panel_frames 的返回值（需含 high、low、close、volume）
+    :return: 布尔 DataFrame（行：箱体长度，列：股票代码）
+    """
+    high, low, close, volume = (
+        frames["high"],
+        frames["low"],
+        frames["close"],
+        frames["volume"],
+    )
+    volume_ema_short = volume.ewm(span=5).mean()
+    volume_ema_long = volume.ewm(span=20).mean()
+    is_volume_growing = (
+        volume_ema_short.iloc[-5:].mean() > volume_ema_long.iloc[-5:].mean()
+    )
+
+    # 箱体取到前一根K线为止，即各箱体 breakout 在最后一行的值
+    boxes = panel_box_levels(high, low, close, lookbacks)
+    n = close.count()
+    hits = {
+        lookback: (n > lookback)
+        & is_volume_growing
+        & boxes[lookback]["breakout"].iloc[-1]
+        for lookback in lookbacks
+    }
+    return pd.DataFrame(hits).T
@@ -1,124 +1,433 @@
 import akshare as ak
 import pandas as pd
 import numpy as np
+import os
+import sys
+import time
 from datetime import datetime
 
+# 与 akshare 目录下的选股脚本共用行情快照缓存和抓取层（import utils.xxx）
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "akshare"
+    ),
+)
+from utils.fetch import fetch_all  # noqa: E402
+from utils.universe import get_spot  # noqa: E402
+
 """"
 创业板非st,今日竞价金额大于100万小于1888万，今日竞价涨幅*今日竞价实际换手率大于0.52，自由流通值小于60亿，今日9点25分股价大于或等于9点24分最高价，（9点25分开盘价-9点24分收盘价）/昨日收盘价*100小于3，9点31分分时成交量大于9000手，9点31分大单净量大于0，9点31分分时成交量/9点30分分时成交量大于4
 
 """
 
 
+# 条件用到的分钟（距 0 点的分钟数）和集合竞价撮合时刻 09:25:00（距 0 点的秒数）
+MINUTE_924 = 9 * 60 + 24
+MINUTE_925 = 9 * 60 + 25
+MINUTE_930 = 9 * 60 + 30
+MINUTE_931 = 9 * 60 + 31
+AUCTION_SECOND = MINUTE_925 * 60
+
+
+def tick_seconds(times):
+    """分时数据的"时间"列（如 "09:25:00"）转为距 0 点的秒数"""
+    return pd.to_timedelta(times.astype(str).str[-8:]).dt.total_seconds()
+
+
+def prepare_ticks(df):
+    """
+    分时成交只解析一次时间：计算距 0 点的秒数和分钟数、成交金额（元）、
+    买盘和卖盘成交金额，只保留 9:24-9:31 的成交
+    :param df: 一只或多只股票的 ak.stock_intraday_em 数据，需含 symbol 列
+    """
+    seconds = tick_seconds(df["时间"])
+    df = df.assign(second=seconds.astype(int), minute=(seconds // 60).astype(int))
+    df = df[(df["minute"] >= MINUTE_924) & (df["minute"] <= MINUTE_931)]
+    amount = df["成交价"] * df["手数"] * 100
+    return df.assign(
+        成交额=amount,
+        买盘金额=amount.where(df["买卖盘性质"] == "买盘", 0.0),
+        卖盘金额=amount.where(df["买卖盘性质"] == "卖盘", 0.0),
+    ).sort_values(["symbol", "second"], kind="stable")
+
+
+# 每分钟汇总的字段：名称 -> (源列, 分钟内汇总方式)，汇总方式也用于合并同一分钟的多批成交
+MINUTE_FIELDS = {
+    "开盘价": ("成交价", "first"),
+    "最高价": ("成交价", "max"),
+    "成交量": ("手数", "sum"),
+    "买盘金额": ("买盘金额", "sum"),
+    "卖盘金额": ("卖盘金额", "sum"),
+    "竞价价": ("竞价价", "first"),
+    "竞价手数": ("竞价手数", "first"),
+}
+
+
+def _group_minutes(ticks, keys):
+    auction = ticks["second"] == AUCTION_SECOND
+    return (
+        ticks.assign(
+            竞价价=ticks["成交价"].where(auction),
+            竞价手数=ticks["手数"].where(auction),
+        )
+        .groupby(keys)
+        .agg(**MINUTE_FIELDS)
+    )
+
+
+def minute_stats(ticks):
+    """
+    所有股票的成交一次按 (股票, 分钟) 分组汇总
+    :return: DataFrame（索引：股票代码，列：(字段, 分钟)）
+    """
+    return _group_minutes(ticks, ["symbol", "minute"]).unstack("minute")
+
+
+def evaluate(universe, stats):
+    """
+    用数组运算一次判断所有股票的各项条件
+    :param universe: DataFrame，每行一只股票，列同 filter_stock 的 stock_info
+    :param stats: minute_stats 的返回值，没有成交的分钟按缺失处理（相关条件不满足）
+    :return: 每只股票的指标、各条件是否满足及"满足条件"列
+    """
+    universe = universe.set_index("symbol")
+    stats = stats.reindex(universe.index)
+
+    def column(field, minute):
+        if (field, minute) in stats.columns:
+            return stats[(field, minute)].astype(float)
+        return pd.Series(np.nan, index=stats.index)
+
+    yesterday_close = universe["yesterday_close"]
+    auction_price = column("竞价价", MINUTE_925)
+    auction_volume = column("竞价手数", MINUTE_925)
+    auction_amount = auction_price * auction_volume * 100
+    auction_change = (auction_price / yesterday_close - 1) * 100
+    turnover_rate = auction_volume / universe["circulation_shares"] * 100
+    price_24 = column("开盘价", MINUTE_924)
+    high_24 = column("最高价", MINUTE_924)
+    volume_30 = column("成交量", MINUTE_930).fillna(0)
+    volume_31 = column("成交量", MINUTE_931).fillna(0)
+
+    result = pd.DataFrame(
+        {
+            "竞价金额": auction_amount,
+            "竞价涨幅": auction_change,
+            "竞价换手率": turnover_rate,
+            "竞价强度": auction_change * turnover_rate,
+            "9:31成交量": volume_31,
+            "9:31量比": volume_31 / volume_30.where(volume_30 > 0),
+        }
+    )
+    conditions = {
+        # 条件1：竞价金额大于100万小于1888万
+        "竞价金额": (auction_amount > 1e6) & (auction_amount < 18.88e6),
+        # 9:25价格不低于9:24最高价
+        "竞价价格": auction_price >= high_24,
+        # 条件2：竞价涨幅*竞价实际换手率 > 0.52
+        "竞价强度": result["竞价强度"] > 0.52,
+        # 条件3：自由流通值<60亿
+        "流通市值": universe["free_circulation_value"] < 60e8,
+        # 条件4：(09:25价-09:24价)/前收盘价*100 <3
+        "竞价价差": (auction_price - price_24) / yesterday_close * 100 < 3,
+        # 条件5：09:31成交量>9000手
+        "9:31成交量": volume_31 > 9000,
+        # 条件6：09:31大单净量>0
+        "9:31大单净量": column("买盘金额", MINUTE_931).fillna(0)
+        > column("卖盘金额", MINUTE_931).fillna(0),
+        # 条件7：09:31成交量/09:30成交量>4
+        "9:31量比": result["9:31量比"] > 4,
+    }
+    for name, passed in conditions.items():
+        result[f"{name}达标"] = passed
+    result["满足条件"] = pd.DataFrame(conditions).all(axis=1)
+    return result.rename_axis("代码").reset_index()
+
+
+def get_universe():
+    """创业板非ST股票，昨收、流通股本、流通市值取自实时行情快照"""
+    spot = get_spot()
+    spot = spot[spot["代码"].str.startswith("30") & ~spot["名称"].str.contains("ST")]
+    yesterday_close = pd.to_numeric(spot["昨收"], errors="coerce")
+    price = pd.to_numeric(spot["最新价"], errors="coerce").fillna(yesterday_close)
+    circulation_value = pd.to_numeric(spot["流通市值"], errors="coerce")
+    return pd.DataFrame(
+        {
+            "symbol": spot["代码"],
+            "名称": spot["名称"],
+            "yesterday_close": yesterday_close,
+            "circulation_shares": circulation_value / price,
+            "free_circulation_value": circulation_value,
+        }
+    ).dropna(subset=["yesterday_close", "circulation_shares"])
+
+
+def _fetch_intraday(symbol):
+    # 出错时直接抛出异常，由 fetch_all 重试并记录失败
+    return ak.stock_intraday_em(symbol=symbol).assign(symbol=symbol)
+
+
+def fetch_intraday(symbols, **kwargs):
+    """
+    按 stock_intraday_em 的全局限流并发获取多只股票的分时成交
+    :param kwargs: 传给 fetch_all，如 retries
+    :return: ({代码: 分时成交}，获取失败的股票代码列表)
+    """
+    results, report = fetch_all(
+        _fetch_intraday, symbols, endpoint="stock_intraday_em", **kwargs
+    )
+    ticks = {s: df for s, df in zip(symbols, results) if df is not None}
+    return ticks, [args[0] for args in report.failed]
+
+
+def fetch_ticks(symbols):
+    """
+    并发获取多只股票的分时成交，合并为一张长表
+    :return: (prepare_ticks 处理后的长表，获取失败的股票代码列表)
+    """
+    ticks, failed = fetch_intraday(symbols)
+    if not ticks:
+        empty = pd.DataFrame(columns=["symbol", "时间", "成交价", "手数", "买卖盘性质"])
+        return prepare_ticks(empty), failed
+    return prepare_ticks(pd.concat(ticks.values(), ignore_index=True)), failed
+
+
+def screen_auction(universe=None):
+    """
+    批量筛选：对创业板非ST全部股票一次判断所有条件，9:31 之后运行
+    :param universe: 同 evaluate，默认 get_universe()
+    :return: (满足全部条件的股票，按竞价强度从高到低排序；分时数据获取失败、未能判断的股票代码)
+    """
+    start = time.time()
+    universe = get_universe() if universe is None else universe
+    # 流通市值条件不需要分时数据，先筛掉以减少请求
+    universe = universe[universe["free_circulation_value"] < 60e8]
+    ticks, failed = fetch_ticks(universe["symbol"].tolist())
+    result = evaluate(universe, minute_stats(ticks))
+    if "名称" in universe:
+        result.insert(1, "名称", universe["名称"].to_numpy())
+    print(f"扫描{len(universe)}只股票，耗时{time.time() - start:.1f}秒")
+    result = result[result["满足条件"]]
+    result = result.sort_values("竞价强度", ascending=False).reset_index(drop=True)
+    return result, failed
+
+
 def filter_stock(stock_info):
     """
     根据多维度条件筛选股票
     :param stock_info: 股票信息对象，包含以下字段：
         - symbol: 股票代码（6位数字）
         - yesterday_close: 昨日收盘价
-        - free_circulation_value: 自由流通市值（亿元）
+        - circulation_shares: 流通股本（股）
+        - free_circulation_value: 自由流通市值（元）
     :return: bool - 是否满足所有条件
     """
-    symbol = stock_info["symbol"]
-    yesterday_close = stock_info["yesterday_close"]
-    circulation_shares = stock_info["circulation_shares"]
-    free_circulation_value = stock_info["free_circulation_value"]
-
-    # 获取分时数据
-    try:
-        df = ak.stock_intraday_em(symbol=symbol)
-    except Exception as e:
-        print(f"获取分时数据失败：{str(e)}")
+    ticks, failed = fetch_ticks([stock_info["symbol"]])
+    if failed:
         return False
+    result = evaluate(pd.DataFrame([stock_info]), minute_stats(ticks))
+    return bool(result["满足条件"].iloc[0])
 
-    # 数据预处理
-    df["时间"] = pd.to_datetime(df["时间"])
-    df["成交额"] = df["成交价"] * df["手数"] * 100  # 计算成交金额（元）
-
-    # 条件1：竞价金额大于100万小于1888万
-    try:
-        # 假设原始数据为纯时间字符串（如 "09:25:00"）
-        df["时间"] = pd.to_datetime(df["时间"], format="%H:%M:%S")
-    except ValueError:
-        # 如果格式不一致，尝试自动解析
-        df["时间"] = pd.to_datetime(df["时间"])
-
-    # 条件1：竞价金额大于100万小于1888万
-    auction_data = df[
-        (df["时间"].dt.hour == 9)
-        & (df["时间"].dt.minute == 25)
-        & (df["时间"].dt.second == 0)
-    ]
-    if auction_data.empty:
-        return False
-    auction_price = auction_data.iloc[0]["成交价"]
-    auction_volume = auction_data.iloc[0]["手数"]
-    auction_amount = auction_price * auction_volume * 100  # 竞价金额
 
-    if not (1e6 < auction_amount < 18.88e6):
-        return False
+# 9:25 集合竞价成交后（9:24 这一分钟已完整）即可判断的条件
+EARLY_CONDITIONS = ("流通市值", "竞价金额", "竞价价格", "竞价强度", "竞价价差")
 
-    # 条件2：竞价涨幅*竞价实际换手率 > 0.52
-    auction_change = (auction_price / yesterday_close - 1) * 100  # 竞价涨幅（%）
+# 需等 9:31 这一分钟结束才能判断的条件
+LATE_CONDITIONS = ("9:31成交量", "9:31大单净量", "9:31量比")
 
-    # 获取09:24:00-09:24:59数据
-    time_24 = df[(df["时间"].dt.hour == 9) & (df["时间"].dt.minute == 24)]
-    if time_24.empty:
-        return False
-    price_24 = time_24.iloc[0]["成交价"]  # 取最早一笔价格
-    high_24 = time_24["成交价"].max()  # 取最高价
 
-    if auction_price < high_24:
-        return False
+class AuctionTracker:
+    """
+    流式筛选：逐批接收分时成交（实时轮询或回放录制文件），按股票累计 9:24-9:31 各分钟的
+    开盘价、最高价、成交量、买卖盘金额和集合竞价成交。集合竞价成交一出现就判断早期条件，
+    不满足的股票立即淘汰、不再跟踪；9:31 这一分钟结束后只需对剩下的少数股票判断其余条件。
+    """
 
-    turnover_rate = auction_volume / circulation_shares * 100  # 换手率百分比
-    if auction_change * turnover_rate <= 0.52:
-        return False
+    def __init__(self, universe):
+        """
+        :param universe: DataFrame，每行一只股票，列同 filter_stock 的 stock_info
+        """
+        self.universe = universe.set_index("symbol")
+        self.minutes = {symbol: {} for symbol in self.universe.index}
+        self.seen = dict.fromkeys(self.universe.index, 0)
+        self.eliminated = {}  # 代码 -> 不满足的第一个条件
+        self.clock = 0  # 此刻之前的成交均已收到（距 0 点的秒数）
+        self.result = None
+        # 流通市值条件不需要分时数据，开始前就淘汰
+        large = self.universe["free_circulation_value"] >= 60e8
+        self.eliminated.update(dict.fromkeys(self.universe.index[large], "流通市值"))
+        self.alive = set(self.universe.index[~large])
+        self.pending = set(self.alive)  # 尚未判断早期条件的股票
 
-    # 条件3：自由流通值<60亿
-    if free_circulation_value >= 60e8:
-        return False
+    def update(self, ticks):
+        """
+        :param ticks: {代码: 该股票截至目前的全部分时成交}（与 ak.stock_intraday_em 返回的相同），
+                      每只股票按行数只处理上次之后新增的部分，所有股票的新成交一起汇总
+        """
+        new = []
+        for symbol, df in ticks.items():
+            if symbol in self.alive and len(df) > self.seen[symbol]:
+                new.append(df.iloc[self.seen[symbol] :].assign(symbol=symbol))
+                self.seen[symbol] = len(df)
+        if not new:
+            return
+        new = prepare_ticks(pd.concat(new, ignore_index=True))
+        if new.empty:
+            return
+        groups = _group_minutes(new, ["symbol", "minute"])
+        for (symbol, minute), row in zip(groups.index, groups.to_dict("records")):
+            merged = self.minutes[symbol].setdefault(minute, row)
+            if merged is row:
+                continue
+            for field, (_, how) in MINUTE_FIELDS.items():
+                if how == "sum":
+                    merged[field] += row[field]
+                elif how == "max":
+                    merged[field] = max(merged[field], row[field])
+                elif pd.isna(merged[field]):
+                    merged[field] = row[field]
 
-    # 条件4：(09:25价-09:24价)/前收盘价*100 <3
-    price_diff_ratio = (auction_price - price_24) / yesterday_close * 100
-    if price_diff_ratio >= 3:
-        return False
+    def _has_auction(self, symbol):
+        return pd.notna(self.minutes[symbol].get(MINUTE_925, {}).get("竞价价"))
 
-    # 条件5：09:31成交量>9000手
-    time_31 = df[(df["时间"].dt.hour == 9) & (df["时间"].dt.minute == 31)]
-    volume_31 = time_31["手数"].sum()
-    if volume_31 <= 9000:
-        return False
+    def _stats(self, symbols):
+        """与 minute_stats 格式相同的汇总表"""
+        return pd.DataFrame.from_dict(
+            {
+                symbol: {
+                    (field, minute): value
+                    for minute, fields in self.minutes[symbol].items()
+                    for field, value in fields.items()
+                }
+                for symbol in symbols
+            },
+            orient="index",
+        )
 
-    # 条件6：09:31大单净量>0
-    buy_volume = time_31[time_31["买卖盘性质"] == "买盘"]["成交额"].sum()
-    sell_volume = time_31[time_31["买卖盘性质"] == "卖盘"]["成交额"].sum()
-    if buy_volume <= sell_volume:
-        return False
+    def _check(self, symbols, names):
+        """判断给定条件，淘汰不满足的股票，返回 evaluate 的结果"""
+        symbols = sorted(symbols)
+        result = evaluate(
+            self.universe.loc[symbols].reset_index(), self._stats(symbols)
+        )
+        for name in names:
+            for symbol in result.loc[~result[f"{name}达标"], "代码"]:
+                if symbol in self.alive:
+                    self.alive.discard(symbol)
+                    self.eliminated[symbol] = name
+        return result
 
-    # 条件7：09:31成交量/09:30成交量>4
-    time_30 = df[(df["时间"].dt.hour == 9) & (df["时间"].dt.minute == 30)]
-    volume_30 = time_30["手数"].sum()
+    def advance(self, second):
+        """
+        时钟推进到 second（此前的成交均已通过 update 收到），判断此时已能确定的条件
+        :return: 9:31 结束后为满足全部条件的股票（按竞价强度排序），之前为 None
+        """
+        self.clock = max(self.clock, second)
+        # 出现集合竞价成交的股票立即判断；9:26 仍没有的，竞价金额条件不满足
+        ready = {
+            symbol
+            for symbol in self.pending
+            if self.clock > AUCTION_SECOND + 60 or self._has_auction(symbol)
+        }
+        if ready:
+            self.pending -= ready
+            self._check(ready, EARLY_CONDITIONS)
+            if not self.pending:
+                print(f"集合竞价后剩余{len(self.alive)}只股票")
 
-    if volume_30 == 0 or volume_31 / volume_30 <= 4:
-        return False
+        if self.result is None and self.clock >= (MINUTE_931 + 1) * 60:
+            result = self._check(self.alive, EARLY_CONDITIONS + LATE_CONDITIONS)
+            result = result[result["满足条件"]]
+            self.result = result.sort_values("竞价强度", ascending=False).reset_index(
+                drop=True
+            )
+        return self.result
 
-    return True
 
+def _now_seconds():
+    now = datetime.now()
+    return now.hour * 3600 + now.minute * 60 + now.second
 
-if __name__ == "__main__":
-    # 构造测试参数
-    stock_info = {
-        "symbol": "300815",
-        "yesterday_close": 18.60,
-        "circulation_shares": 386.83e6,
-        "free_circulation_value": 86.34e8,
-    }
 
-    try:
-        # 执行筛选函数
-        result = filter_stock(stock_info)
+def track_live(universe=None, interval=3):
+    """
+    实时流式筛选：9:25 之前启动，集合竞价成交后每隔 interval 秒轮询一次
+    未被淘汰股票的分时成交，直到 9:31 这一分钟结束；
+    某次轮询失败的股票不重试，下一轮重新获取
+    """
+    tracker = AuctionTracker(get_universe() if universe is None else universe)
+    while tracker.result is None:
+        second = _now_seconds()
+        if second >= AUCTION_SECOND:
+            ticks, _ = fetch_intraday(sorted(tracker.alive), retries=0)
+            tracker.update(ticks)
+            tracker.advance(second)
+        if tracker.result is None:
+            time.sleep(interval)
+    return tracker.result
 
-        print(f"股票{stock_info['symbol']}是否满足条件：{result}")
 
-    except Exception as e:
-        print(f"执行异常：{str(e)}")
+def save_ticks(directory, universe=None):
+    """
+    9:31 之后把股票列表和每只股票的分时成交录制为 CSV，供 replay_ticks 离线回放
+    :return: 获取失败、未录制的股票代码
+    """
+    universe = get_universe() if universe is None else universe
+    os.makedirs(directory, exist_ok=True)
+    universe.to_csv(os.path.join(directory, "universe.csv"), index=False)
+    ticks, failed = fetch_intraday(universe["symbol"].tolist())
+    for symbol, df in ticks.items():
+        df.drop(columns="symbol").to_csv(
+            os.path.join(directory, f"{symbol}.csv"), index=False
+        )
+    return failed
+
+
+def replay_ticks(directory, step=1):
+    """
+    按成交时间逐 step 秒回放录制的分时成交，不需要行情接口
+    :return: 回放结束后的 AuctionTracker（result 为筛选结果，eliminated 为淘汰原因）
+    """
+    universe = pd.read_csv(
+        os.path.join(directory, "universe.csv"), dtype={"symbol": str}
+    )
+    ticks, seconds = {}, {}
+    for symbol in universe["symbol"]:
+        path = os.path.join(directory, f"{symbol}.csv")
+        if os.path.exists(path):
+            ticks[symbol] = pd.read_csv(path, dtype={"时间": str})
+            seconds[symbol] = tick_seconds(ticks[symbol]["时间"]).to_numpy()
+
+    tracker = AuctionTracker(universe)
+    # 最后一步总是落在 9:31 这一分钟结束时，step 不整除时也能得到结果
+    end = (MINUTE_931 + 1) * 60
+    for clock in [*range(MINUTE_924 * 60, end, step), end]:
+        tracker.update(
+            {
+                symbol: ticks[symbol].iloc[
+                    : np.searchsorted(seconds[symbol], clock, side="left")
+                ]
+                for symbol in tracker.alive & ticks.keys()
+            }
+        )
+        if tracker.advance(clock) is not None:
+            break
+    return tracker
+
+
+if __name__ == "__main__":
+    # python call_auction.py [live | record 目录 | replay 目录]，默认 9:31 之后批量筛选
+    pd.set_option("display.max_columns", None)
+    mode = sys.argv[1] if len(sys.argv) > 1 else "batch"
+    if mode == "live":
+        print(track_live())
+    elif mode == "record":
+        save_ticks(sys.argv[2])
+    elif mode == "replay":
+        print(replay_ticks(sys.argv[2]).result)
+    else:
+        result, failed = screen_auction()
+        print(result)
+        if failed:
+            print(f"{len(failed)}只股票分时数据获取失败，未参与筛选：{failed}")
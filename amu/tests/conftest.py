@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 脚本以 amu 目录为工作目录运行（import call_auction），测试同样把该目录加入搜索路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,106 @@
+import os
+import pandas as pd
+import pytest
+import call_auction
+import utils.fetch
+from call_auction import filter_stock, replay_ticks, screen_auction
+
+# 录制的分时成交（save_ticks 的格式）：各股票分别不满足某一项条件，
+# 300101、300102 满足全部条件，300113 没有录制（分时数据获取失败）
+RECORDING = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "auction")
+
+
+def _original_filter_stock(stock_info, df):
+    """改写前的逐只实现（ak.stock_intraday_em 的返回值改为参数传入），作为对照"""
+    yesterday_close = stock_info["yesterday_close"]
+    circulation_shares = stock_info["circulation_shares"]
+    free_circulation_value = stock_info["free_circulation_value"]
+    df = df.copy()
+    df["成交额"] = df["成交价"] * df["手数"] * 100
+    df["时间"] = pd.to_datetime(df["时间"], format="%H:%M:%S")
+
+    auction_data = df[
+        (df["时间"].dt.hour == 9)
+        & (df["时间"].dt.minute == 25)
+        & (df["时间"].dt.second == 0)
+    ]
+    if auction_data.empty:
+        return False
+    auction_price = auction_data.iloc[0]["成交价"]
+    auction_volume = auction_data.iloc[0]["手数"]
+    auction_amount = auction_price * auction_volume * 100
+    if not (1e6 < auction_amount < 18.88e6):
+        return False
+
+    auction_change = (auction_price / yesterday_close - 1) * 100
+    time_24 = df[(df["时间"].dt.hour == 9) & (df["时间"].dt.minute == 24)]
+    if time_24.empty:
+        return False
+    price_24 = time_24.iloc[0]["成交价"]
+    high_24 = time_24["成交价"].max()
+    if auction_price < high_24:
+        return False
+
+    turnover_rate = auction_volume / circulation_shares * 100
+    if auction_change * turnover_rate <= 0.52:
+        return False
+    if free_circulation_value >= 60e8:
+        return False
+    price_diff_ratio = (auction_price - price_24) / yesterday_close * 100
+    if price_diff_ratio >= 3:
+        return False
+
+    time_31 = df[(df["时间"].dt.hour == 9) & (df["时间"].dt.minute == 31)]
+    volume_31 = time_31["手数"].sum()
+    if volume_31 <= 9000:
+        return False
+    buy_volume = time_31[time_31["买卖盘性质"] == "买盘"]["成交额"].sum()
+    sell_volume = time_31[time_31["买卖盘性质"] == "卖盘"]["成交额"].sum()
+    if buy_volume <= sell_volume:
+        return False
+    time_30 = df[(df["时间"].dt.hour == 9) & (df["时间"].dt.minute == 30)]
+    volume_30 = time_30["手数"].sum()
+    if volume_30 == 0 or volume_31 / volume_30 <= 4:
+        return False
+    return True
+
+
+def _recorded_intraday(symbol):
+    path = os.path.join(RECORDING, f"{symbol}.csv")
+    if not os.path.exists(path):
+        raise KeyError(symbol)
+    return pd.read_csv(path, dtype={"时间": str})
+
+
+@pytest.fixture
+def universe(monkeypatch):
+    """录制的股票列表；行情接口改为读取录制文件，不限流"""
+    monkeypatch.setattr(
+        call_auction.ak, "stock_intraday_em", _recorded_intraday, raising=False
+    )
+    monkeypatch.setattr(utils.fetch, "_throttled", False)
+    return pd.read_csv(os.path.join(RECORDING, "universe.csv"), dtype={"symbol": str})
+
+
+def test_batch_replay_and_original_agree(universe):
+    expected = set()
+    for stock_info in universe.to_dict("records"):
+        try:
+            ticks = _recorded_intraday(stock_info["symbol"])
+        except KeyError:
+            continue
+        if _original_filter_stock(stock_info, ticks):
+            expected.add(stock_info["symbol"])
+    assert expected == {"300101", "300102"}
+
+    result, failed = screen_auction(universe)
+    assert set(result["代码"]) == expected
+    assert failed == ["300113"]
+
+    for stock_info in universe.to_dict("records"):
+        assert filter_stock(stock_info) == (stock_info["symbol"] in expected)
+
+    for step in (1, 7):
+        tracker = replay_ticks(RECORDING, step)
+        assert set(tracker.result["代码"]) == expected
+        assert set(tracker.eliminated) == set(universe["symbol"]) - expected